@@ -0,0 +1,62 @@
+import os
+import time
+from typing import Any, Dict, Hashable, Iterable, Optional, Set, Tuple
+
+
+class TTLCache:
+    """
+    A small in-process cache with a time-to-live per entry.
+    Every worker process has its own copy, so the TTL also bounds how stale
+    a value can get on workers that did not see the invalidation.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int = 10_000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: Dict[Hashable, Tuple[float, Any]] = {}
+        self._tags: Dict[Hashable, Set[Hashable]] = {}
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            self._entries.pop(key, None)
+            return None
+        return value
+
+    def set(self, key: Hashable, value: Any, tags: Iterable[Hashable] = ()):
+        """`tags` let invalidate_tag() drop every entry that depends on the same source"""
+        if len(self._entries) >= self.max_entries:
+            self._evict()
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+
+    def invalidate(self, key: Hashable):
+        self._entries.pop(key, None)
+
+    def invalidate_tag(self, tag: Hashable):
+        for key in self._tags.pop(tag, ()):
+            self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+        self._tags.clear()
+
+    def _evict(self):
+        # קודם מוחקים ערכים שפג תוקפם, ואם עדיין מלא - את הוותיק ביותר
+        now = time.monotonic()
+        for key in [k for k, (expires_at, _) in self._entries.items() if expires_at < now]:
+            del self._entries[key]
+        if len(self._entries) >= self.max_entries:
+            del self._entries[next(iter(self._entries))]
+
+
+# Owner dashboard statistics, keyed by owner_id
+owner_stats_cache = TTLCache(ttl_seconds=float(os.getenv("STATS_CACHE_TTL_SECONDS", 300)))
+
+# Effective (template + overrides) branch menus, keyed by menu_id.
+# Tagged with "template:<id>" and "owner:<id>" for invalidation.
+effective_menu_cache = TTLCache(ttl_seconds=float(os.getenv("MENU_CACHE_TTL_SECONDS", 600)))
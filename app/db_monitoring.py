@@ -0,0 +1,207 @@
+"""
+Mongo command monitoring:
+
+- MongoCommandListener is registered on the AsyncIOMotorClient and records a latency
+  histogram per collection and operation, and logs slow commands with their filter shape
+  and the request ID.
+- DBStatsMiddleware counts the commands each request sends, so N+1 query patterns show up
+  in the metrics and in the log.
+"""
+import os
+import threading
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+
+from pymongo import monitoring
+
+from app.logger import logger, request_id_contextvar
+
+MONGO_MONITORING_ENABLED = os.getenv("MONGO_MONITORING_ENABLED", "true").lower() == "true"
+MONGO_SLOW_QUERY_MS = float(os.getenv("MONGO_SLOW_QUERY_MS", 100))
+MONGO_COMMANDS_PER_REQUEST_WARN = int(os.getenv("MONGO_COMMANDS_PER_REQUEST_WARN", 25))
+# GET /health/mongo חושף שמות של collections וזמני תגובה, לכן כבוי כברירת מחדל
+MONGO_METRICS_ENDPOINT_ENABLED = os.getenv("MONGO_METRICS_ENDPOINT_ENABLED", "false").lower() == "true"
+
+# פקודות תחזוקה של הדרייבר שלא מעניינות אותנו
+_IGNORED_COMMANDS = {
+    "hello", "ismaster", "isMaster", "ping", "buildinfo", "buildInfo", "endSessions",
+    "saslStart", "saslContinue", "authenticate", "getnonce", "killCursors",
+}
+
+# Where each command keeps its filter
+_FILTER_FIELDS = {
+    "find": "filter",
+    "count": "query",
+    "distinct": "query",
+    "findAndModify": "query",
+}
+
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+COMMANDS_PER_REQUEST_BUCKETS = (1, 2, 3, 5, 10, 25, 50, 100)
+
+
+class Histogram:
+    """A fixed-bucket histogram; the last count holds everything above the last bound"""
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.total += value
+        self.count += 1
+        self.max = max(self.max, value)
+
+    def snapshot(self) -> dict:
+        labels = [f"<={bound}" for bound in self.bounds] + [f">{self.bounds[-1]}"]
+        return {
+            "count": self.count,
+            "avg": round(self.total / self.count, 3) if self.count else 0.0,
+            "max": round(self.max, 3),
+            "buckets": dict(zip(labels, self.counts)),
+        }
+
+
+class RequestDBStats:
+    """Commands sent to Mongo while serving one request"""
+
+    def __init__(self):
+        self.commands = 0
+        self.duration_ms = 0.0
+
+
+# The stats object of the current request (None outside requests).
+# Motor runs pymongo in a thread pool with the caller's context copied, so the listener
+# sees the same object and request ID as the handler that issued the command.
+request_db_stats_contextvar: ContextVar[Optional[RequestDBStats]] = ContextVar("request_db_stats", default=None)
+
+
+def filter_shape(value):
+    """Replaces every value in a filter with '?' and keeps field names and operators"""
+    if isinstance(value, dict):
+        return {key: filter_shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [filter_shape(value[0])] if value else []
+    return "?"
+
+
+def _command_filter(command_name: str, command) -> Optional[dict]:
+    if command_name in _FILTER_FIELDS:
+        return command.get(_FILTER_FIELDS[command_name])
+    if command_name == "aggregate":
+        pipeline = command.get("pipeline") or []
+        return next((stage["$match"] for stage in pipeline if "$match" in stage), None)
+    if command_name in ("update", "delete"):
+        statements = command.get("updates" if command_name == "update" else "deletes") or []
+        return statements[0].get("q") if statements else None
+    return None
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """
+    Called by pymongo from the thread that runs the command, hence the lock.
+    """
+
+    def __init__(self, slow_query_ms: float = MONGO_SLOW_QUERY_MS):
+        self.slow_query_ms = slow_query_ms
+        self._lock = threading.Lock()
+        self._pending: Dict[Tuple[int, object], tuple] = {}
+        self._latency: Dict[Tuple[str, str], Histogram] = {}
+        self._commands_per_request = Histogram(COMMANDS_PER_REQUEST_BUCKETS)
+
+    def started(self, event):
+        if event.command_name in _IGNORED_COMMANDS:
+            return
+        collection = event.command.get(event.command_name)
+        if event.command_name == "getMore":
+            collection = event.command.get("collection")
+        if not isinstance(collection, str):
+            collection = "-"
+
+        pending = (
+            f"{event.database_name}.{collection}",
+            _command_filter(event.command_name, event.command),
+            request_id_contextvar.get(),
+            request_db_stats_contextvar.get(),
+        )
+        with self._lock:
+            self._pending[(event.request_id, event.connection_id)] = pending
+
+    def succeeded(self, event):
+        self._finish(event, failed=False)
+
+    def failed(self, event):
+        self._finish(event, failed=True)
+
+    def _finish(self, event, failed: bool):
+        with self._lock:
+            pending = self._pending.pop((event.request_id, event.connection_id), None)
+            if pending is None:
+                return
+            namespace, command_filter, request_id, stats = pending
+            duration_ms = event.duration_micros / 1000
+
+            key = (namespace, event.command_name)
+            if key not in self._latency:
+                self._latency[key] = Histogram(LATENCY_BUCKETS_MS)
+            self._latency[key].observe(duration_ms)
+
+            if stats is not None:
+                stats.commands += 1
+                stats.duration_ms += duration_ms
+
+        if duration_ms >= self.slow_query_ms:
+            logger.warning(
+                f"Slow Mongo command{' (failed)' if failed else ''}: {event.command_name} on {namespace} "
+                f"took {duration_ms:.1f}ms, request {request_id}, filter {filter_shape(command_filter)}"
+            )
+
+    def observe_request(self, stats: RequestDBStats):
+        with self._lock:
+            self._commands_per_request.observe(stats.commands)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "commands": {
+                    f"{namespace} {command_name}": histogram.snapshot()
+                    for (namespace, command_name), histogram in sorted(self._latency.items())
+                },
+                "commands_per_request": self._commands_per_request.snapshot(),
+            }
+
+
+command_listener = MongoCommandListener()
+
+
+class DBStatsMiddleware:
+    """
+    Gives each request a RequestDBStats and warns about requests that send
+    more than MONGO_COMMANDS_PER_REQUEST_WARN commands.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not MONGO_MONITORING_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestDBStats()
+        token = request_db_stats_contextvar.set(stats)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            request_db_stats_contextvar.reset(token)
+            command_listener.observe_request(stats)
+            if stats.commands > MONGO_COMMANDS_PER_REQUEST_WARN:
+                logger.warning(
+                    f"{scope.get('method')} {scope.get('path')} sent {stats.commands} Mongo commands "
+                    f"({stats.duration_ms:.1f}ms in total), possible N+1 query pattern"
+                )
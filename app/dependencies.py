@@ -1,4 +1,6 @@
-from fastapi import Depends, HTTPException, status
+import os
+from typing import List, Optional
+from fastapi import Depends, HTTPException, Query, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from app.services.auth_service import AuthService
 from app.models import User, UserRole
@@ -46,4 +48,28 @@ async def get_restaurant_owner(current_user: User = Depends(get_verified_user))
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Access denied. This action requires a Restaurant Owner account."
         )
-    return current_user
\ No newline at end of file
+    return current_user
+
+# מספר המזהים המקסימלי בבקשת batch אחת
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", 100))
+
+def batch_ids(ids: str = Query(..., description="Comma-separated ids")) -> List[str]:
+    """
+    Parses the `ids` query parameter of the batch endpoints.
+    Removes duplicates (keeping order) and enforces MAX_BATCH_SIZE.
+    """
+    parsed = list(dict.fromkeys(part.strip() for part in ids.split(",") if part.strip()))
+    if not parsed:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No ids given")
+    if len(parsed) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Too many ids: at most {MAX_BATCH_SIZE} per request"
+        )
+    return parsed
+
+def batch_fields(fields: Optional[str] = Query(None, description="Comma-separated fields to return")) -> Optional[List[str]]:
+    """Parses the optional `fields` projection of the batch endpoints"""
+    if fields is None:
+        return None
+    return [part.strip() for part in fields.split(",") if part.strip()] or None
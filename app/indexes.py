@@ -0,0 +1,47 @@
+"""
+Checks that the indexes declared on the Beanie models exist in Mongo.
+Used on boot when STARTUP_MODE=fast skips index creation; the indexes themselves
+are created by `python -m app.migrations.sync_indexes`.
+"""
+from typing import List, Tuple
+
+from pymongo import IndexModel
+
+IndexKey = Tuple[Tuple[str, object], ...]
+
+
+def _normalize(key) -> IndexKey:
+    items = key.items() if hasattr(key, "items") else key
+    return tuple((field, int(direction) if isinstance(direction, float) else direction) for field, direction in items)
+
+
+def expected_indexes(model) -> List[IndexKey]:
+    """Index keys declared on a model, from Indexed(...) fields and Settings.indexes"""
+    keys = []
+    for name, field in model.model_fields.items():
+        indexed = getattr(field.annotation, "_indexed", None)
+        if indexed is None:
+            indexed = next((getattr(meta, "_indexed") for meta in field.metadata if hasattr(meta, "_indexed")), None)
+        if indexed is not None:
+            keys.append(((field.alias or name, indexed[0]),))
+
+    for index in getattr(model.Settings, "indexes", []):
+        if isinstance(index, IndexModel):
+            keys.append(_normalize(index.document["key"]))
+        elif isinstance(index, str):
+            keys.append(((index, 1),))
+        else:
+            keys.append(_normalize(index))
+    return keys
+
+
+async def find_missing_indexes(models) -> List[str]:
+    """Returns '<collection>: <key>' for every declared index that does not exist yet"""
+    missing = []
+    for model in models:
+        collection = model.get_motor_collection()
+        existing = {_normalize(info["key"]) for info in (await collection.index_information()).values()}
+        for key in expected_indexes(model):
+            if key not in existing:
+                missing.append(f"{collection.name}: {list(key)}")
+    return missing
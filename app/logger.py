@@ -22,9 +22,9 @@ def setup_logging():
         '[%(asctime)s] [%(levelname)s] [TraceID: %(request_id)s] %(message)s'
     )
 
-    # כתיבה לקובץ עם Rotation
+    # כתיבה לקובץ עם Rotation (הקובץ נפתח רק בכתיבה הראשונה)
     file_handler = RotatingFileHandler(
-        f"{log_dir}/app.log", maxBytes=5*1024*1024, backupCount=5
+        f"{log_dir}/app.log", maxBytes=5*1024*1024, backupCount=5, delay=True
     )
     file_handler.setFormatter(formatter)
 
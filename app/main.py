@@ -1,7 +1,14 @@
 import os
+import time
 import uuid
+
+_IMPORT_STARTED = time.perf_counter()  # למדידת זמן הייבוא של הראוטרים והמודלים
 from app.logger import logger, request_id_contextvar 
-from fastapi import FastAPI, Request
+from app.middleware import RequestIDMiddleware
+from app.profiling import ProfilingMiddleware, loop_lag_monitor, LOOP_MONITOR_ENABLED
+from app.db_monitoring import DBStatsMiddleware, command_listener, MONGO_MONITORING_ENABLED, MONGO_METRICS_ENDPOINT_ENABLED
+from app.dependencies import get_restaurant_owner
+from fastapi import Depends, FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
 from beanie import init_beanie
@@ -10,9 +17,16 @@ from beanie import init_beanie
 from app.routes.menus import router as menu_router
 from app.routes.auth import router as auth_router 
 from app.routes.restaurants import router as restaurant_router
-from app.models import User, Menu, Restaurant
+from app.models import DOCUMENT_MODELS
+from app.indexes import find_missing_indexes
+from app.services.schedule_service import menu_scheduler, MENU_SCHEDULER_ENABLED
+
+# "full" (ברירת מחדל): init_beanie יוצר אינדקסים בכל עלייה.
+# "fast": רק בודקים שהאינדקסים קיימים; יוצרים אותם עם python -m app.migrations.sync_indexes
+STARTUP_MODE = os.getenv("STARTUP_MODE", "full").lower()
 
 app = FastAPI(title="MenuMaster API")
+app.state.startup_timings = {"imports_ms": round((time.perf_counter() - _IMPORT_STARTED) * 1000, 1)}
 
 # --- הגדרות CORS ---
 # שיניתי מעט את ההגדרות כדי לוודא שדפדפנים (Flutter Web) מקבלים אישור מלא
@@ -23,6 +37,10 @@ app.add_middleware(
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS", "PATCH"],
     allow_headers=["Content-Type", "Authorization", "Accept"],
 )
+# ה-Middleware האחרון שנוסף רץ ראשון: קודם נקבע ה-Request ID ורק אז הפרופיילר
+app.add_middleware(DBStatsMiddleware)
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(RequestIDMiddleware)
 
 # Include Routers
 app.include_router(auth_router, prefix="/auth", tags=["Authentication"])
@@ -37,16 +55,58 @@ async def startup_event():
     if not database_url:
         raise ValueError("DATABASE_URL is not set in environment variables")
 
-    client = AsyncIOMotorClient(database_url)
+    timings = app.state.startup_timings
+    phase_started = time.perf_counter()
+
+    def end_phase(name: str):
+        nonlocal phase_started
+        now = time.perf_counter()
+        timings[f"{name}_ms"] = round((now - phase_started) * 1000, 1)
+        phase_started = now
+
+    # Listener שמודד כל פקודה למונגו (ראה app/db_monitoring.py)
+    event_listeners = [command_listener] if MONGO_MONITORING_ENABLED else []
+    client = AsyncIOMotorClient(database_url, event_listeners=event_listeners)
+    end_phase("mongo_client")
     
     # אתחול Beanie עם כל המודלים
     # ודאנו ש-Restaurant מופיע כאן כדי למנוע CollectionWasNotInitialized
     await init_beanie(
         database=client.menumaster_auth, 
-        document_models=[User, Menu, Restaurant] 
+        document_models=DOCUMENT_MODELS,
+        skip_indexes=STARTUP_MODE == "fast"
     )
+    end_phase("init_beanie")
+
+    if STARTUP_MODE == "fast":
+        missing = await find_missing_indexes(DOCUMENT_MODELS)
+        if missing:
+            logger.warning(f"Missing indexes, run 'python -m app.migrations.sync_indexes': {missing}")
+        end_phase("verify_indexes")
+
+    if LOOP_MONITOR_ENABLED:
+        loop_lag_monitor.start()
+        end_phase("loop_monitor")
+
+    if MENU_SCHEDULER_ENABLED:
+        # הטעינה וקביעת המצב הנוכחי רצות ברקע ולא מעכבות את העלייה
+        menu_scheduler.start()
+        end_phase("menu_scheduler")
+
+    logger.info(f"Startup ({STARTUP_MODE} mode) timings: {timings}")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    loop_lag_monitor.stop()
+    menu_scheduler.stop()
 
 @app.get("/health")
 async def health_check():
     """בדיקת תקינות מהירה של השרת"""
-    return {"status": "ok", "database": "mongodb"}
\ No newline at end of file
+    return {"status": "ok", "database": "mongodb", "startup": app.state.startup_timings}
+
+if MONGO_METRICS_ENDPOINT_ENABLED:
+    @app.get("/health/mongo", dependencies=[Depends(get_restaurant_owner)])
+    async def mongo_metrics():
+        """היסטוגרמות זמני תגובה של פקודות מונגו ומספר פקודות לבקשה (לבעלי מסעדות מחוברים בלבד)"""
+        return command_listener.snapshot()
@@ -0,0 +1,42 @@
+import re
+import uuid
+from app.logger import request_id_contextvar
+
+REQUEST_ID_HEADER = "x-request-id"
+# המזהה נכנס לשמות קבצים וללוגים, לכן מקבלים רק תווים בטוחים
+_VALID_REQUEST_ID = re.compile(r"[A-Za-z0-9._-]{1,64}")
+
+
+class RequestIDMiddleware:
+    """
+    נותן לכל בקשה מזהה (Trace ID) שמופיע בכל שורת לוג ובכותרת X-Request-ID של התשובה.
+    אם הקליינט שלח X-Request-ID משתמשים בו, אחרת נוצר מזהה חדש.
+    Pure ASGI middleware, so the handler keeps running in the request's own task.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        request_id = headers.get(REQUEST_ID_HEADER.encode(), b"").decode("latin-1")
+        if not _VALID_REQUEST_ID.fullmatch(request_id):
+            request_id = uuid.uuid4().hex[:12]
+        token = request_id_contextvar.set(request_id)
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (REQUEST_ID_HEADER.encode(), request_id.encode("latin-1")),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            request_id_contextvar.reset(token)
@@ -0,0 +1,21 @@
+"""
+One-off maintenance commands, run with `python -m app.migrations.<name>`.
+"""
+import os
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from beanie import init_beanie
+
+from app.models import DOCUMENT_MODELS
+
+
+async def connect():
+    """Connects to Mongo and initializes Beanie the same way the API does on startup"""
+    load_dotenv()
+    database_url = os.getenv("DATABASE_URL")
+    if not database_url:
+        raise ValueError("DATABASE_URL is not set in environment variables")
+
+    client = AsyncIOMotorClient(database_url)
+    await init_beanie(database=client.menumaster_auth, document_models=DOCUMENT_MODELS)
+    return client
@@ -0,0 +1,30 @@
+"""
+Fills Restaurant.search_terms for restaurants created before autocomplete existed.
+New and updated restaurants get their terms from the model's before_event hook.
+
+Usage:
+    python -m app.migrations.backfill_restaurant_search
+"""
+import asyncio
+
+from app.logger import logger
+from app.migrations import connect
+from app.models import Restaurant
+from app.search import search_terms
+
+
+async def main():
+    await connect()
+
+    updated = 0
+    async for restaurant in Restaurant.find_all():
+        terms = search_terms(restaurant.name)
+        if restaurant.search_terms != terms:
+            await restaurant.set({Restaurant.search_terms: terms})
+            updated += 1
+
+    logger.info(f"Updated search terms of {updated} restaurants")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
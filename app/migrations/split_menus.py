@@ -0,0 +1,41 @@
+"""
+Moves existing EMBEDDED menus to the SPLIT layout
+(menu header + menu_categories + menu_item_buckets).
+
+Usage:
+    python -m app.migrations.split_menus                 # every embedded menu
+    python -m app.migrations.split_menus --min-items 500 # only the big ones
+    python -m app.migrations.split_menus --dry-run
+"""
+import argparse
+import asyncio
+
+from app.logger import logger
+from app.migrations import connect
+from app.models import Menu, MenuStorage
+from app.services.menu_service import MenuService
+
+
+async def main(min_items: int, dry_run: bool):
+    await connect()
+
+    migrated = 0
+    async for menu in Menu.find(Menu.storage != MenuStorage.SPLIT):
+        item_count = sum(len(category.items) for category in menu.categories)
+        if item_count < min_items:
+            continue
+
+        logger.info(f"Splitting menu {menu.id} ({len(menu.categories)} categories, {item_count} items)")
+        if not dry_run:
+            await MenuService.split_menu(menu)
+        migrated += 1
+
+    logger.info(f"{'Would split' if dry_run else 'Split'} {migrated} menus")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--min-items", type=int, default=0, help="only split menus with at least this many dishes")
+    parser.add_argument("--dry-run", action="store_true", help="only report which menus would be split")
+    args = parser.parse_args()
+    asyncio.run(main(args.min_items, args.dry_run))
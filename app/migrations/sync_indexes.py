@@ -0,0 +1,28 @@
+"""
+Creates the indexes declared on the Beanie models.
+Run it on deploy when the API boots with STARTUP_MODE=fast, which only verifies them.
+
+Usage:
+    python -m app.migrations.sync_indexes
+"""
+import asyncio
+
+from app.indexes import find_missing_indexes
+from app.logger import logger
+from app.migrations import connect
+from app.models import DOCUMENT_MODELS
+
+
+async def main():
+    # connect() מריץ init_beanie מלא, שיוצר את כל האינדקסים החסרים
+    await connect()
+
+    missing = await find_missing_indexes(DOCUMENT_MODELS)
+    if missing:
+        logger.error(f"Indexes still missing after sync: {missing}")
+    else:
+        logger.info(f"All indexes of {len(DOCUMENT_MODELS)} collections are in place")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
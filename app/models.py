@@ -1,8 +1,10 @@
 from datetime import datetime
-from typing import List, Optional
-from beanie import Document, Indexed
-from pydantic import BaseModel, EmailStr
+from typing import ClassVar, List, Optional
+from beanie import Document, PydanticObjectId, Indexed, Insert, Replace, Save, SaveChanges, before_event
+from pydantic import BaseModel, EmailStr, Field, field_validator
+from pymongo import IndexModel
 from enum import Enum
+from app.search import search_terms
 
 # 1. Roles (חייב להיות ראשון)
 class UserRole(str, Enum):
@@ -19,9 +21,31 @@ class Restaurant(Document):
     owner_id: str  # References User.id
     menu_ids: List[str] = [] 
     is_active: bool = True
+    timezone: str = "Asia/Jerusalem"  # IANA name, used for menu availability windows
+    search_terms: List[str] = []  # Normalized name prefixes for autocomplete, see app/search.py
+
+    @before_event(Insert, Replace, Save, SaveChanges)
+    def refresh_search_terms(self):
+        """Keeps search_terms in sync with the name on every write through the document"""
+        self.search_terms = search_terms(self.name)
 
     class Settings:
         name = "restaurants"
+        indexes = [
+            [("owner_id", 1)],
+            [("search_terms", 1), ("is_active", 1)],
+        ]
+
+class RestaurantSuggestion(BaseModel):
+    """A light restaurant entry returned by the autocomplete endpoint"""
+    id: PydanticObjectId = Field(alias="_id")
+    name: str
+    location: str
+    image_url: Optional[str] = None
+
+class IdView(BaseModel):
+    """Projection that loads nothing but the document id"""
+    id: PydanticObjectId = Field(alias="_id")
 
 # 3. Menu Related Models
 class MenuItem(BaseModel):
@@ -37,16 +61,152 @@ class MenuCategory(BaseModel):
     name: str
     items: List[MenuItem] = []
 
+class MenuCategorySummary(BaseModel):
+    """A category name with its number of dishes, used by the per-category endpoints"""
+    name: str
+    item_count: int = 0
+
+class MenuStorage(str, Enum):
+    """Where the categories and dishes of a menu are stored"""
+    EMBEDDED = "embedded"  # categories[].items[] inside the Menu document
+    SPLIT = "split"  # Menu is a header, categories and items live in their own collections
+
+class ItemRef(BaseModel):
+    """Points at a dish of a template menu by category and dish name"""
+    category: str
+    item: str
+
+class PriceOverride(ItemRef):
+    price: float
+
+class ExtraItem(BaseModel):
+    """A dish only this branch serves; a category missing from the template is added at the end"""
+    category: str
+    item: MenuItem
+
+class MenuOverrides(BaseModel):
+    """What a branch menu changes on top of its template"""
+    prices: List[PriceOverride] = []
+    hidden_items: List[ItemRef] = []
+    extra_items: List[ExtraItem] = []
+
+class AvailabilityWindow(BaseModel):
+    """
+    A weekly recurring window, in the restaurant's local time, during which a menu is active.
+    An `end` earlier than `start` runs past midnight; equal times mean the whole day.
+    """
+    days: List[int] = Field(default=[0, 1, 2, 3, 4, 5, 6])  # 0 = Monday ... 6 = Sunday
+    start: str = Field(pattern=r"^([01]\d|2[0-3]):[0-5]\d$")  # "HH:MM"
+    end: str = Field(pattern=r"^([01]\d|2[0-3]):[0-5]\d$")
+
+    @field_validator("days")
+    @classmethod
+    def check_days(cls, days: List[int]) -> List[int]:
+        if not days or any(day < 0 or day > 6 for day in days):
+            raise ValueError("days must be a non-empty list of weekdays between 0 (Monday) and 6 (Sunday)")
+        return sorted(set(days))
+
 class Menu(Document):
     """The main Menu document stored in MongoDB"""
     title: str
-    restaurant_id: str # Linked to Restaurant
+    restaurant_id: str # Linked to Restaurant ("" for chain templates)
     owner_id: str  # References the User.id
     categories: List[MenuCategory] = []
     is_active: bool = False
+    storage: MenuStorage = MenuStorage.EMBEDDED
+    is_template: bool = False  # A chain-level menu that branch menus are built from
+    template_id: Optional[str] = None  # Set on branch menus, references the template Menu.id
+    overrides: Optional[MenuOverrides] = None  # Branch changes, only with template_id
+    schedule: List[AvailabilityWindow] = []  # When set, the scheduler drives is_active
 
     class Settings:
         name = "menus"
+        indexes = [
+            [("owner_id", 1), ("restaurant_id", 1)],
+            [("restaurant_id", 1), ("is_active", 1)],
+            [("is_active", 1)],
+            [("template_id", 1)],
+            [("schedule.start", 1)],
+        ]
+
+class CloneMenuRequest(BaseModel):
+    """Restaurants to copy a menu to (or to create branch menus for, when cloning a template)"""
+    restaurant_ids: List[str] = Field(min_length=1)
+
+class MenuCategoryDocument(Document):
+    """A category of a SPLIT menu, stored apart from the Menu header"""
+    menu_id: str  # References Menu.id
+    name: str
+    position: int = 0
+
+    class Settings:
+        name = "menu_categories"
+        indexes = [
+            # ייחודיים: הוספות מקבילות לא יקבלו אותו מיקום ולא ייצרו שם כפול
+            IndexModel([("menu_id", 1), ("position", 1)], unique=True),
+            IndexModel([("menu_id", 1), ("name", 1)], unique=True),
+        ]
+
+class MenuItemBucket(Document):
+    """
+    A bucket of dishes belonging to one category of a SPLIT menu.
+    Items are appended to the newest bucket until it holds BUCKET_SIZE dishes,
+    so a huge category never grows a single document without bound.
+    """
+    BUCKET_SIZE: ClassVar[int] = 200
+
+    menu_id: str  # References Menu.id
+    category_id: str  # References MenuCategoryDocument.id
+    item_count: int = 0  # not "count", which would shadow Document.count()
+    items: List[MenuItem] = []
+
+    class Settings:
+        name = "menu_item_buckets"
+        indexes = [
+            [("category_id", 1), ("item_count", 1)],
+            [("menu_id", 1)],
+        ]
+
+class PriceAdjustment(str, Enum):
+    """How a bulk repricing rule changes each price"""
+    PERCENTAGE = "percentage"  # value=5 means +5%
+    ABSOLUTE = "absolute"  # value=-2 means 2 less
+
+class RepriceRequest(BaseModel):
+    """Scope and rule of a bulk price change. Omitted scope fields mean 'all of the owner's'"""
+    # רשימה ריקה נדחית, כדי שבחירה ריקה בקליינט לא תתפרש כ"הכל"
+    restaurant_ids: Optional[List[str]] = Field(default=None, min_length=1)
+    menu_ids: Optional[List[str]] = Field(default=None, min_length=1)
+    category_name: Optional[str] = None
+    adjustment: PriceAdjustment = PriceAdjustment.PERCENTAGE
+    value: float = 0.0
+    round_to_ending: Optional[float] = Field(default=None, ge=0, lt=1)  # 0.9 -> 12.34 becomes 12.90
+    dry_run: bool = True
+
+class RepriceSummary(BaseModel):
+    """What a bulk price change did (or would do, on a dry run)"""
+    dry_run: bool
+    menus_matched: int = 0
+    items_matched: int = 0
+    items_changed: int = 0
+    total_before: float = 0.0
+    total_after: float = 0.0
+    documents_modified: int = 0
+
+class RestaurantStats(BaseModel):
+    """Dashboard numbers for a single restaurant of an owner"""
+    restaurant_id: str
+    restaurant_name: Optional[str] = None
+    menu_count: int = 0
+    active_menu_count: int = 0
+    active_menu_ratio: float = 0.0
+    category_count: int = 0
+    item_count: int = 0
+    unavailable_item_count: int = 0
+    unavailable_item_ratio: float = 0.0
+    min_price: Optional[float] = None
+    avg_price: Optional[float] = None
+    max_price: Optional[float] = None
 
 # 4. User Models
 class User(Document):
@@ -67,4 +227,7 @@ class UserCreate(BaseModel):
     username: str
     email: EmailStr
     password: str
-    role: UserRole = UserRole.REGULAR_USER
\ No newline at end of file
+    role: UserRole = UserRole.REGULAR_USER
+
+# All Beanie documents, in the order they are handed to init_beanie
+DOCUMENT_MODELS = [User, Menu, Restaurant, MenuCategoryDocument, MenuItemBucket]
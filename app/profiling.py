@@ -0,0 +1,204 @@
+"""
+Opt-in tools for finding blocking code inside async handlers:
+
+- ProfilingMiddleware samples the event-loop thread while selected requests run
+  and writes folded stacks (flamegraph.pl / speedscope / inferno compatible).
+- LoopLagMonitor logs the stack of whatever holds the event loop longer than a threshold.
+
+Both are off unless enabled through environment variables.
+"""
+import asyncio
+import hmac
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, Optional
+
+from app.logger import logger, request_id_contextvar
+
+PROFILE_ENABLED = os.getenv("PROFILE_ENABLED", "false").lower() == "true"
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", 0.0))  # חלק הבקשות שנדגמות, 0.0-1.0
+PROFILE_HEADER = os.getenv("PROFILE_HEADER", "X-Profile").lower()
+# הכותרת מפעילה פרופיילינג רק עם הערך הזה; בלי טוקן הכותרת מתעלמים ממנה
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+PROFILE_MAX_CONCURRENT = int(os.getenv("PROFILE_MAX_CONCURRENT", 2))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", 5))
+
+LOOP_MONITOR_ENABLED = os.getenv("LOOP_MONITOR_ENABLED", "false").lower() == "true"
+LOOP_LAG_THRESHOLD_MS = float(os.getenv("LOOP_LAG_THRESHOLD_MS", 100))
+
+# id(task) -> request id of the request that task is serving
+_task_requests: Dict[int, str] = {}
+
+
+def _frame_label(frame, current_line: bool = False) -> str:
+    code = frame.f_code
+    line = frame.f_lineno if current_line else code.co_firstlineno
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{line})"
+
+
+def _walk(frame):
+    while frame is not None:
+        yield frame
+        frame = frame.f_back
+
+
+def _folded_stack(frame) -> str:
+    return ";".join(reversed([_frame_label(f) for f in _walk(frame)]))
+
+
+class StackSampler(threading.Thread):
+    """
+    Samples the stack of one thread at a fixed interval until stopped,
+    then writes the samples as folded stacks to `output_path`.
+    Runs in its own thread so neither sampling nor the file write touches the event loop.
+    """
+
+    def __init__(self, target_thread_id: int, output_path: str, interval_ms: float = PROFILE_INTERVAL_MS):
+        super().__init__(name="stack-sampler", daemon=True)
+        self.target_thread_id = target_thread_id
+        self.output_path = output_path
+        self.interval = interval_ms / 1000
+        self.samples: Counter = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.target_thread_id)
+            if frame is not None:
+                self.samples[_folded_stack(frame)] += 1
+        self._write()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _write(self):
+        if not self.samples:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.output_path) or ".", exist_ok=True)
+            with open(self.output_path, "w", encoding="utf-8") as f:
+                for stack, count in self.samples.most_common():
+                    f.write(f"{stack} {count}\n")
+        except OSError as e:
+            logger.error(f"Failed to write profile {self.output_path}: {e}")
+
+
+class ProfilingMiddleware:
+    """
+    Profiles PROFILE_SAMPLE_RATE of the requests, plus any request whose PROFILE_HEADER
+    header carries PROFILE_TOKEN, when PROFILE_ENABLED is true. At most
+    PROFILE_MAX_CONCURRENT requests are profiled at a time; the rest run unprofiled.
+    Also records which task serves which request, for LoopLagMonitor.
+    Samples cover the whole event-loop thread, so concurrent requests show up in each other's profiles.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.active_samplers = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        task = asyncio.current_task()
+        task_key = id(task)
+        _task_requests[task_key] = request_id_contextvar.get()
+
+        sampler = None
+        if PROFILE_ENABLED and self.active_samplers < PROFILE_MAX_CONCURRENT and self._should_profile(scope):
+            sampler = StackSampler(threading.get_ident(), self._output_path(scope))
+            sampler.start()
+            self.active_samplers += 1
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _task_requests.pop(task_key, None)
+            if sampler:
+                sampler.stop()
+                self.active_samplers -= 1
+
+    @staticmethod
+    def _should_profile(scope) -> bool:
+        headers = dict(scope.get("headers") or [])
+        token = headers.get(PROFILE_HEADER.encode())
+        if PROFILE_TOKEN and token is not None and hmac.compare_digest(token, PROFILE_TOKEN.encode()):
+            return True
+        return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+    @staticmethod
+    def _output_path(scope) -> str:
+        path = scope.get("path", "").strip("/").replace("/", "_") or "root"
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}_{request_id_contextvar.get()}_{scope.get('method', '')}_{path}.folded"
+        return os.path.join(PROFILE_DIR, name)
+
+
+class LoopLagMonitor:
+    """
+    A coroutine updates a heartbeat every interval; a watchdog thread checks it.
+    When the heartbeat is older than the threshold the loop is blocked, and the watchdog
+    logs the loop thread's stack together with the request ID of the running task.
+    """
+
+    def __init__(self, threshold_ms: float = LOOP_LAG_THRESHOLD_MS):
+        self.threshold = threshold_ms / 1000
+        self.interval = min(self.threshold / 2, 0.05)
+        self._heartbeat = time.monotonic()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._beat_task: Optional[asyncio.Task] = None
+        self._stop_event = threading.Event()
+
+    def start(self):
+        """Must be called from the event loop it should watch"""
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stop_event.clear()
+        self._beat_task = self._loop.create_task(self._beat())
+        threading.Thread(target=self._watch, name="loop-lag-monitor", daemon=True).start()
+        logger.info(f"Event loop lag monitor started (threshold {self.threshold * 1000:.0f}ms)")
+
+    def stop(self):
+        self._stop_event.set()
+        if self._beat_task:
+            self._beat_task.cancel()
+
+    async def _beat(self):
+        while True:
+            self._heartbeat = time.monotonic()
+            await asyncio.sleep(self.interval)
+
+    def _watch(self):
+        reported_heartbeat = None
+        while not self._stop_event.wait(self.interval):
+            heartbeat = self._heartbeat
+            lag = time.monotonic() - heartbeat - self.interval
+
+            if reported_heartbeat is not None and heartbeat != reported_heartbeat:
+                blocked_for = heartbeat - reported_heartbeat - self.interval
+                logger.warning(f"Event loop unblocked after ~{blocked_for * 1000:.0f}ms")
+                reported_heartbeat = None
+
+            if lag > self.threshold and reported_heartbeat is None:
+                reported_heartbeat = heartbeat
+                self._report(lag)
+
+    def _report(self, lag: float):
+        task = asyncio.current_task(self._loop)
+        request_id = _task_requests.get(id(task), "UNKNOWN") if task else "NONE"
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = "\n".join(_frame_label(f, current_line=True) for f in _walk(frame)) if frame else "<no frame>"
+        logger.warning(
+            f"Event loop blocked for {lag * 1000:.0f}ms+ by request {request_id} "
+            f"(task {task.get_name() if task else None}). Stack, innermost first:\n{stack}"
+        )
+
+
+loop_lag_monitor = LoopLagMonitor()
@@ -1,8 +1,12 @@
 from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, status, Response
-from app.models import Menu, MenuItem, User
+from app.models import (
+    CloneMenuRequest, Menu, MenuCategory, MenuCategorySummary, MenuItem, MenuOverrides,
+    RepriceRequest, RepriceSummary, User,
+)
 from app.services.menu_service import MenuService
-from app.dependencies import get_verified_user, get_restaurant_owner
+from app.services.pricing_service import PricingService
+from app.dependencies import get_verified_user, get_restaurant_owner, batch_ids, batch_fields
 from app.logger import logger # ייבוא הלוגר המרכזי
 
 router = APIRouter()
@@ -17,7 +21,7 @@ async def get_all_menus(response: Response):
     """
     logger.info("Fetching all active menus")
     try:
-        menus = await Menu.find(Menu.is_active == True).to_list()
+        menus = await MenuService.get_active_menus()
         if not menus:
             logger.info("No active menus found in database")
             response.status_code = status.HTTP_204_NO_CONTENT
@@ -27,16 +31,53 @@ async def get_all_menus(response: Response):
         logger.error(f"Error fetching menus: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+@router.get("/batch", tags=["Public - Menus"])
+async def get_menus_batch(
+    ids: List[str] = Depends(batch_ids),
+    fields: Optional[List[str]] = Depends(batch_fields)
+):
+    """
+    Retrieves many menus in one call: /menus/batch?ids=a,b,c[&fields=title,restaurant_id].
+    Every requested id appears in `results`; ids that were not found map to null
+    and are also listed in `not_found`.
+    """
+    logger.info(f"Fetching a batch of {len(ids)} menus")
+    found = await MenuService.get_menus_by_ids(ids, fields)
+    return {
+        "results": {menu_id: found.get(menu_id) for menu_id in ids},
+        "not_found": [menu_id for menu_id in ids if menu_id not in found],
+    }
+
 @router.get("/{menu_id}", tags=["Public - Menus"])
 async def get_single_menu(menu_id: str):
     """Retrieve a specific menu by ID."""
     logger.info(f"Fetching menu with ID: {menu_id}")
-    menu = await Menu.get(menu_id)
+    menu = await MenuService.get_menu(menu_id)
     if not menu:
         logger.warning(f"Menu {menu_id} not found")
         raise HTTPException(status_code=404, detail="Menu not found")
     return menu
 
+@router.get("/{menu_id}/categories", tags=["Public - Menus"], response_model=List[MenuCategorySummary])
+async def get_menu_categories(menu_id: str):
+    """Lists the categories of a menu with their dish counts, without the dishes."""
+    logger.info(f"Fetching categories of menu {menu_id}")
+    categories = await MenuService.get_menu_categories(menu_id)
+    if categories is None:
+        logger.warning(f"Menu {menu_id} not found")
+        raise HTTPException(status_code=404, detail="Menu not found")
+    return categories
+
+@router.get("/{menu_id}/categories/{category_name}", tags=["Public - Menus"], response_model=MenuCategory)
+async def get_menu_category(menu_id: str, category_name: str):
+    """Retrieves a single category of a menu with its dishes."""
+    logger.info(f"Fetching category '{category_name}' of menu {menu_id}")
+    category = await MenuService.get_menu_category(menu_id, category_name)
+    if not category:
+        logger.warning(f"Category '{category_name}' not found in menu {menu_id}")
+        raise HTTPException(status_code=404, detail="Menu or category not found")
+    return category
+
 # --- PROTECTED ENDPOINTS (Restaurant Owners Only) ---
 
 @router.post("/create", tags=["Owner - Menus"], status_code=status.HTTP_201_CREATED)
@@ -59,6 +100,34 @@ async def create_menu(
         logger.error(f"Failed to create menu: {str(e)}")
         raise HTTPException(status_code=500, detail="Could not create menu. Check if restaurant_id is valid.")
 
+@router.post("/templates", tags=["Owner - Menus"], status_code=status.HTTP_201_CREATED)
+async def create_menu_template(
+    title: str,
+    current_user: User = Depends(get_restaurant_owner)
+):
+    """
+    Creates an empty chain-level template menu.
+    Fill it with the regular category/item endpoints, then clone it to the branches.
+    """
+    logger.info(f"User {current_user.email} is creating menu template '{title}'")
+    template = await MenuService.create_template(title=title, owner_id=str(current_user.id))
+    logger.info(f"Menu template created successfully with ID: {template.id}")
+    return template
+
+@router.post("/reprice", tags=["Owner - Menus"], response_model=RepriceSummary)
+async def reprice_menus(
+    rule: RepriceRequest,
+    current_user: User = Depends(get_restaurant_owner)
+):
+    """
+    Changes the prices of every dish in scope (restaurants, menus, category name) in one pass.
+    Defaults to a dry run that only reports what would change.
+    """
+    logger.info(f"User {current_user.email} is repricing menus (dry_run={rule.dry_run}): {rule.adjustment.value} {rule.value}")
+    summary = await PricingService.reprice(rule, str(current_user.id))
+    logger.info(f"Repricing matched {summary.items_matched} items in {summary.menus_matched} menus, {summary.items_changed} changed")
+    return summary
+
 @router.get("/my-menus", tags=["Owner - Menus"], response_model=List[Menu])
 async def get_my_menus(response: Response, current_user: User = Depends(get_restaurant_owner)):
     """Returns all menus belonging to the authenticated owner."""
@@ -109,6 +178,30 @@ async def add_dish(
     )
     return menu
 
+@router.put("/{menu_id}/overrides", tags=["Owner - Menus"])
+async def set_branch_overrides(
+    menu_id: str,
+    overrides: MenuOverrides,
+    current_user: User = Depends(get_restaurant_owner)
+):
+    """Replaces the price changes, hidden dishes and extra dishes of a branch menu."""
+    logger.info(f"Setting overrides of branch menu {menu_id}")
+    return await MenuService.set_overrides(menu_id, overrides, str(current_user.id))
+
+@router.post("/{menu_id}/clone", tags=["Owner - Menus"], status_code=status.HTTP_201_CREATED)
+async def clone_menu(
+    menu_id: str,
+    request: CloneMenuRequest,
+    current_user: User = Depends(get_restaurant_owner)
+):
+    """
+    Copies a menu to many restaurants in one call.
+    Cloning a template creates branch menus that follow it.
+    """
+    logger.info(f"Cloning menu {menu_id} to {len(request.restaurant_ids)} restaurants")
+    created = await MenuService.clone_menu(menu_id, request.restaurant_ids, str(current_user.id))
+    return {"source_menu_id": menu_id, "created": created}
+
 @router.delete("/{menu_id}", tags=["Owner - Menus"])
 async def delete_menu(
     menu_id: str, 
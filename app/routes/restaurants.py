@@ -1,8 +1,9 @@
 from typing import Optional, List 
-from fastapi import APIRouter, Depends, HTTPException, status, Response
-from app.models import Restaurant, User
+from fastapi import APIRouter, Depends, HTTPException, Query, status, Response
+from app.models import AvailabilityWindow, Restaurant, RestaurantSuggestion, User
 from app.services.restaurant_service import RestaurantService
-from app.dependencies import get_restaurant_owner
+from app.dependencies import get_restaurant_owner, batch_ids, batch_fields
+from app.logger import logger
 
 
 router = APIRouter()
@@ -28,6 +29,32 @@ async def get_all_restaurants(response: Response):
             detail="Service temporarily unavailable"
         )
 
+@router.get("/suggest", tags=["Public - Restaurants"], response_model=List[RestaurantSuggestion])
+async def suggest_restaurants(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(10, ge=1, le=25)
+):
+    """
+    השלמה אוטומטית לשם מסעדה לפי תחילית, עבור תיבת החיפוש באפליקציה.
+    מתעלם מאותיות גדולות/קטנות, ניקוד וסימנים דיאקריטיים.
+    """
+    return await RestaurantService.suggest_restaurants(q, limit)
+
+@router.get("/batch", tags=["Public - Restaurants"])
+async def get_restaurants_batch(
+    ids: List[str] = Depends(batch_ids),
+    fields: Optional[List[str]] = Depends(batch_fields)
+):
+    """
+    מאחזר מספר מסעדות בקריאה אחת: /restaurants/batch?ids=a,b,c[&fields=name,location].
+    כל מזהה מופיע ב-results; מזהה שלא נמצא מקבל null ומופיע גם ב-not_found.
+    """
+    found = await RestaurantService.get_restaurants_by_ids(ids, fields)
+    return {
+        "results": {restaurant_id: found.get(restaurant_id) for restaurant_id in ids},
+        "not_found": [restaurant_id for restaurant_id in ids if restaurant_id not in found],
+    }
+
 # --- Protected Routes ---
 
 @router.get("/my-restaurants", tags=["Owner - Restaurants"])
@@ -49,12 +76,34 @@ async def get_my_restaurants(
     except Exception as e:
         raise HTTPException(status_code=500, detail="Internal server error")
 
+@router.get("/my-restaurants/stats", tags=["Owner - Restaurants"])
+async def get_my_restaurants_stats(
+    response: Response,
+    current_user: User = Depends(get_restaurant_owner)
+):
+    """
+    מחזיר נתוני דשבורד לכל מסעדה של הבעלים: תפריטים, קטגוריות, מנות ומחירים.
+    אם אין נתונים, מחזיר 204.
+    """
+    try:
+        stats = await RestaurantService.get_owner_stats(str(current_user.id))
+
+        if not stats:
+            response.status_code = status.HTTP_204_NO_CONTENT
+            return None
+
+        return stats
+    except Exception as e:
+        logger.error(f"Error computing stats for owner {current_user.email}: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
         
 @router.post("/", tags=["Owner - Restaurants"])
 async def create_restaurant(
     name: str, 
     location: str, 
     image_url: Optional[str] = None,
+    timezone: str = "Asia/Jerusalem",
     current_user: User = Depends(get_restaurant_owner)
 ):
     """Creates a new restaurant for the authenticated owner."""
@@ -62,7 +111,8 @@ async def create_restaurant(
         name=name, 
         location=location, 
         owner_id=str(current_user.id), 
-        image_url=image_url
+        image_url=image_url,
+        timezone=timezone
     )
 
 
@@ -83,4 +133,26 @@ async def set_menu_status(
     )
     if not updated_menu:
         raise HTTPException(status_code=404, detail="Menu or Restaurant not found/not yours")
-    return updated_menu
\ No newline at end of file
+    return updated_menu
+
+@router.put("/{restaurant_id}/menus/{menu_id}/schedule", tags=["Owner - Restaurants"])
+async def set_menu_schedule(
+    restaurant_id: str,
+    menu_id: str,
+    schedule: List[AvailabilityWindow],
+    current_user: User = Depends(get_restaurant_owner)
+):
+    """
+    קובע חלונות זמינות שבועיים לתפריט (לפי אזור הזמן של המסעדה), למשל בוקר/צהריים/ערב.
+    התפריט מופעל ומכובה אוטומטית במעברים. רשימה ריקה מבטלת את התזמון.
+    שינוי ידני של הסטטוס נשמר עד המעבר הבא.
+    """
+    updated_menu = await RestaurantService.set_menu_schedule(
+        menu_id=menu_id,
+        restaurant_id=restaurant_id,
+        owner_id=str(current_user.id),
+        schedule=schedule
+    )
+    if not updated_menu:
+        raise HTTPException(status_code=404, detail="Menu or Restaurant not found/not yours")
+    return updated_menu
@@ -0,0 +1,34 @@
+import re
+import unicodedata
+from typing import List
+
+# אותיות סופיות מנורמלות לצורה הרגילה, כדי ש"שלו" יתאים גם ל"שלום" בזמן ההקלדה
+_HEBREW_FINAL_LETTERS = str.maketrans("ךםןףץ", "כמנפצ")
+# Apostrophes, geresh and gershayim are dropped inside words (Tony's -> tonys, צ׳יפס -> ציפס)
+_DROPPED_CHARS = re.compile(r"['\"`’׳״]")
+_SEPARATORS = re.compile(r"[^\w\s]")
+
+MAX_SEARCH_TERMS = 10
+
+
+def normalize_search_text(text: str) -> str:
+    """
+    Case-folds, strips diacritics (including Hebrew niqqud), maps Hebrew final letters
+    to their regular form and collapses punctuation and whitespace.
+    """
+    text = unicodedata.normalize("NFKD", text.casefold())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    text = text.translate(_HEBREW_FINAL_LETTERS)
+    text = _DROPPED_CHARS.sub("", text)
+    text = _SEPARATORS.sub(" ", text)
+    return " ".join(text.split())
+
+
+def search_terms(name: str) -> List[str]:
+    """
+    The normalized name starting at every word, so a prefix search can match
+    the beginning of any word: "Pizza Hut Tel Aviv" -> ["pizza hut tel aviv", "hut tel aviv", ...]
+    """
+    words = normalize_search_text(name).split()
+    terms = [" ".join(words[start:]) for start in range(min(len(words), MAX_SEARCH_TERMS))]
+    return list(dict.fromkeys(terms))
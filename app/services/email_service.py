@@ -3,7 +3,6 @@ import os
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.header import Header
-from jinja2 import Environment, FileSystemLoader
 
 class EmailService:
     SMTP_SERVER = os.getenv("SMTP_SERVER", "smtp.gmail.com")
@@ -14,12 +13,20 @@ class EmailService:
     # הגדרת Jinja2 לטעינת קבצים מתיקיית templates
     # השתמש בנתיב יחסי למיקום הקובץ הנוכחי
     template_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "templates")
-    env = Environment(loader=FileSystemLoader(template_dir))
+    _env = None
+
+    @classmethod
+    def get_env(cls):
+        """Builds the Jinja2 environment on first use instead of at import time"""
+        if cls._env is None:
+            from jinja2 import Environment, FileSystemLoader
+            cls._env = Environment(loader=FileSystemLoader(cls.template_dir))
+        return cls._env
 
     @classmethod
     async def send_verification_email(cls, target_email: str, code: str):
         # טעינת התבנית לפי שם הקובץ
-        template = cls.env.get_template("verify_email.html")
+        template = cls.get_env().get_template("verify_email.html")
         
         # "הזרקת" המשתנים לתוך ה-HTML
         html_content = template.render(code=code)
@@ -45,7 +52,7 @@ class EmailService:
     async def send_welcome_email(cls, target_email: str, username: str):
         try:
             # טעינת התבנית החדשה
-            template = cls.env.get_template("welcome_verified.html")
+            template = cls.get_env().get_template("welcome_verified.html")
             html_content = template.render(username=username)
 
             message = MIMEMultipart()
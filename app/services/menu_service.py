@@ -1,25 +1,471 @@
 # app/services/menu_service.py
-from app.models import Menu, MenuCategory, MenuItem
+import os
+from app.models import (
+    Menu, MenuCategory, MenuItem, MenuStorage, MenuCategoryDocument,
+    MenuItemBucket, MenuCategorySummary, MenuOverrides, Restaurant, IdView, AvailabilityWindow,
+)
+from app.cache import owner_stats_cache, effective_menu_cache
+from app.services.schedule_service import menu_scheduler
 from beanie import PydanticObjectId
-from typing import List, Optional
+from fastapi import HTTPException, status
+from pymongo.errors import DuplicateKeyError
+from pydantic import BaseModel
+from typing import Dict, List, Optional, Union
+
+class _MenuStorageView(BaseModel):
+    """Projection used to find out how a menu is stored without loading its dishes"""
+    storage: MenuStorage = MenuStorage.EMBEDDED
+    template_id: Optional[str] = None
+
+class _MenuCloneView(BaseModel):
+    """The header fields needed to clone a menu"""
+    title: str
+    owner_id: str
+    is_template: bool = False
+    schedule: List[AvailabilityWindow] = []
 
 class MenuService:
+    # המבנה שבו נשמרים תפריטים חדשים: "embedded" (ברירת מחדל) או "split"
+    DEFAULT_STORAGE = MenuStorage(os.getenv("MENU_STORAGE", MenuStorage.EMBEDDED.value))
+
+    @staticmethod
+    def assemble_stages() -> List[dict]:
+        """
+        Aggregation stages that rebuild `categories[].items[]` of SPLIT menus
+        from `menu_categories` and `menu_item_buckets`.
+        EMBEDDED menus pass through with their own categories, and their lookup
+        stops at its first stage without reading anything.
+        """
+        return [
+            {"$addFields": {"_menu_key": {"$toString": "$_id"}}},
+            {"$lookup": {
+                "from": "menu_categories",
+                "localField": "_menu_key",
+                "foreignField": "menu_id",
+                "let": {"storage": "$storage"},
+                "pipeline": [
+                    {"$match": {"$expr": {"$eq": ["$$storage", MenuStorage.SPLIT.value]}}},
+                    {"$sort": {"position": 1}},
+                    {"$addFields": {"_category_key": {"$toString": "$_id"}}},
+                    {"$lookup": {
+                        "from": "menu_item_buckets",
+                        "localField": "_category_key",
+                        "foreignField": "category_id",
+                        "pipeline": [
+                            {"$sort": {"_id": 1}},
+                            {"$unwind": "$items"},
+                            {"$replaceRoot": {"newRoot": "$items"}},
+                        ],
+                        "as": "items",
+                    }},
+                    {"$project": {"_id": 0, "name": 1, "items": 1}},
+                ],
+                "as": "_split_categories",
+            }},
+            {"$addFields": {"categories": {"$cond": [
+                {"$eq": ["$storage", MenuStorage.SPLIT.value]},
+                "$_split_categories",
+                "$categories",
+            ]}}},
+            {"$project": {"_menu_key": 0, "_split_categories": 0}},
+        ]
+
+    @classmethod
+    def resolve_branch_stages(cls) -> List[dict]:
+        """
+        Aggregation stages that give branch menus the categories of their effective menu:
+        the template's categories without hidden dishes, with the branch's prices, and with
+        extra dishes appended to their category. Categories that only the branch adds come
+        last, in the order of their first extra dish. Run after assemble_stages().
+        This is the only place the resolution rules live; reads and stats both use it.
+        """
+        prices = {"$ifNull": ["$overrides.prices", []]}
+        hidden = {"$ifNull": ["$overrides.hidden_items", []]}
+        extras = {"$ifNull": ["$overrides.extra_items", []]}
+        template_categories = {"$ifNull": [{"$arrayElemAt": ["$_template.categories", 0]}, []]}
+
+        def extra_items(category_name) -> dict:
+            return {"$map": {
+                "input": {"$filter": {
+                    "input": extras, "as": "extra", "cond": {"$eq": ["$$extra.category", category_name]},
+                }},
+                "as": "extra",
+                "in": "$$extra.item",
+            }}
+
+        override_price = {"$arrayElemAt": [{"$map": {
+            "input": {"$filter": {"input": prices, "as": "override", "cond": {"$and": [
+                {"$eq": ["$$override.category", "$$category.name"]},
+                {"$eq": ["$$override.item", "$$item.name"]},
+            ]}}},
+            "as": "override",
+            "in": "$$override.price",
+        }}, 0]}
+        visible_items = {"$filter": {
+            "input": "$$category.items",
+            "as": "item",
+            "cond": {"$not": [{"$in": [{"category": "$$category.name", "item": "$$item.name"}, hidden]}]},
+        }}
+        branch_categories = {"$concatArrays": [
+            {"$map": {
+                "input": template_categories,
+                "as": "category",
+                "in": {"name": "$$category.name", "items": {"$concatArrays": [
+                    {"$map": {
+                        "input": visible_items,
+                        "as": "item",
+                        "in": {"$mergeObjects": ["$$item", {"price": {"$ifNull": [override_price, "$$item.price"]}}]},
+                    }},
+                    extra_items("$$category.name"),
+                ]}},
+            }},
+            {"$map": {
+                # שמות הקטגוריות החדשות לפי סדר הופעתן, בלי כפילויות
+                "input": {"$reduce": {
+                    "input": extras,
+                    "initialValue": [],
+                    "in": {"$cond": [
+                        {"$in": ["$$this.category", {"$concatArrays": [
+                            "$$value",
+                            {"$map": {"input": template_categories, "as": "category", "in": "$$category.name"}},
+                        ]}]},
+                        "$$value",
+                        {"$concatArrays": ["$$value", ["$$this.category"]]},
+                    ]},
+                }},
+                "as": "name",
+                "in": {"name": "$$name", "items": extra_items("$$name")},
+            }},
+        ]}
+
+        return [
+            {"$addFields": {"_template_oid": {"$convert": {
+                "input": "$template_id", "to": "objectId", "onError": None, "onNull": None,
+            }}}},
+            {"$lookup": {
+                "from": "menus",
+                "localField": "_template_oid",
+                "foreignField": "_id",
+                "pipeline": [*cls.assemble_stages(), {"$project": {"categories": 1}}],
+                "as": "_template",
+            }},
+            {"$addFields": {"categories": {"$cond": [
+                {"$ifNull": ["$template_id", False]},
+                branch_categories,
+                "$categories",
+            ]}}},
+            {"$project": {"_template_oid": 0, "_template": 0}},
+        ]
+
+    @classmethod
+    async def _find_assembled(cls, match: dict) -> List[Menu]:
+        """
+        Runs `match` over the menus collection and returns full Menu objects.
+        Branch menus are returned as their effective menu (template + overrides)
+        and kept in effective_menu_cache.
+        """
+        pipeline = [{"$match": match}, *cls.assemble_stages(), *cls.resolve_branch_stages()]
+        menus = await Menu.aggregate(pipeline, projection_model=Menu).to_list()
+        for menu in menus:
+            if menu.template_id:
+                effective_menu_cache.set(
+                    str(menu.id), menu,
+                    tags=(f"template:{menu.template_id}", f"owner:{menu.owner_id}")
+                )
+        return menus
+
+    @staticmethod
+    def _invalidate_menu(menu: Menu):
+        """Drops cached data that depends on `menu` after it was changed"""
+        owner_stats_cache.invalidate(menu.owner_id)
+        effective_menu_cache.invalidate(str(menu.id))
+        if menu.is_template:
+            effective_menu_cache.invalidate_tag(f"template:{menu.id}")
+
     @staticmethod
     async def create_menu(title: str, owner_id: str, restaurant_id: str):
         # עכשיו אנחנו מעבירים את כל שלושת השדות הנדרשים
         new_menu = Menu(
             title=title, 
             owner_id=owner_id, 
-            restaurant_id=restaurant_id
+            restaurant_id=restaurant_id,
+            storage=MenuService.DEFAULT_STORAGE
         )
         await new_menu.insert()
+        owner_stats_cache.invalidate(owner_id)
         return new_menu
 
+    @classmethod
+    async def create_template(cls, title: str, owner_id: str) -> Menu:
+        """Creates an empty chain-level template menu; it is filled like any other menu"""
+        template = Menu(
+            title=title,
+            owner_id=owner_id,
+            restaurant_id="",
+            is_template=True,
+            storage=cls.DEFAULT_STORAGE
+        )
+        await template.insert()
+        return template
+
+    @classmethod
+    async def set_overrides(cls, menu_id: str, overrides: MenuOverrides, user_id: str) -> Optional[Menu]:
+        """Replaces the overrides of a branch menu and returns its new effective menu"""
+        menu = await Menu.get(menu_id)
+
+        if not menu:
+            raise HTTPException(status_code=404, detail="Menu not found")
+
+        if menu.owner_id != user_id:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="You do not have permission to modify this menu"
+            )
+
+        if not menu.template_id:
+            raise HTTPException(status_code=400, detail="Only branch menus of a template have overrides")
+
+        # עדכון חלקי ולא save(), כדי לא לבטל שינוי סטטוס של המתזמן או של הבעלים שנעשה בינתיים
+        await menu.set({Menu.overrides: overrides.model_dump()})
+        cls._invalidate_menu(menu)
+        return await cls.get_menu(menu_id)
+
+    @classmethod
+    async def clone_menu(cls, menu_id: str, restaurant_ids: List[str], user_id: str) -> Dict[str, str]:
+        """
+        Copies a menu to many restaurants in one call and returns {restaurant_id: new_menu_id}.
+        Cloning a template creates small branch menus that point at it.
+        Cloning any other menu copies it inside Mongo with a single $merge; the copies are
+        inactive, embedded menus.
+        """
+        source = None
+        if PydanticObjectId.is_valid(menu_id):
+            source = await Menu.find_one(Menu.id == PydanticObjectId(menu_id)).project(_MenuCloneView)
+
+        if not source:
+            raise HTTPException(status_code=404, detail="Menu not found")
+
+        if source.owner_id != user_id:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="You do not have permission to clone this menu"
+            )
+
+        restaurant_ids = list(dict.fromkeys(restaurant_ids))
+        valid_ids = [PydanticObjectId(rid) for rid in restaurant_ids if PydanticObjectId.is_valid(rid)]
+        owned = await Restaurant.find(
+            {"_id": {"$in": valid_ids}, "owner_id": user_id}
+        ).project(IdView).to_list()
+        owned_ids = {str(restaurant.id) for restaurant in owned}
+        not_owned = [rid for rid in restaurant_ids if rid not in owned_ids]
+        if not_owned:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Restaurants not found or not yours: {', '.join(not_owned)}"
+            )
+
+        created = {rid: PydanticObjectId() for rid in restaurant_ids}
+
+        if source.is_template:
+            await Menu.insert_many([
+                Menu(
+                    id=new_id,
+                    title=source.title,
+                    restaurant_id=rid,
+                    owner_id=user_id,
+                    template_id=menu_id,
+                    overrides=MenuOverrides()
+                )
+                for rid, new_id in created.items()
+            ])
+        else:
+            targets = [{"_id": new_id, "restaurant_id": rid} for rid, new_id in created.items()]
+            pipeline = [
+                {"$match": {"_id": PydanticObjectId(menu_id)}},
+                *cls.assemble_stages(),
+                {"$set": {
+                    "_targets": {"$literal": targets},
+                    "storage": MenuStorage.EMBEDDED.value,
+                    "is_active": False,
+                }},
+                {"$unwind": "$_targets"},
+                {"$set": {"_id": "$_targets._id", "restaurant_id": "$_targets.restaurant_id"}},
+                {"$unset": "_targets"},
+                {"$merge": {"into": "menus", "on": "_id", "whenMatched": "fail", "whenNotMatched": "insert"}},
+            ]
+            await Menu.aggregate(pipeline).to_list()
+            if source.schedule:
+                # העותקים מקבלים את הלוח של המקור; המתזמן מפעיל אותם אם הם בתוך חלון עכשיו
+                await menu_scheduler.refresh_many([str(new_id) for new_id in created.values()])
+
+        owner_stats_cache.invalidate(user_id)
+        return {rid: str(new_id) for rid, new_id in created.items()}
+
+    @classmethod
+    async def get_menu(cls, menu_id: str) -> Optional[Menu]:
+        """Retrieves a single menu in the regular response shape, whatever its storage"""
+        cached = effective_menu_cache.get(menu_id)
+        if cached is not None:
+            return cached
+        if not PydanticObjectId.is_valid(menu_id):
+            return None
+        menus = await cls._find_assembled({"_id": PydanticObjectId(menu_id)})
+        return menus[0] if menus else None
+
+    @classmethod
+    async def get_menus_by_ids(cls, menu_ids: List[str], fields: Optional[List[str]] = None) -> Dict[str, Union[Menu, dict]]:
+        """
+        Fetches many menus with a single $in query, keyed by id.
+        Unknown and invalid ids are simply missing from the result.
+        When `fields` is given only those fields (and _id) are returned, as plain dicts.
+        """
+        object_ids = [PydanticObjectId(menu_id) for menu_id in menu_ids if PydanticObjectId.is_valid(menu_id)]
+        if not object_ids:
+            return {}
+
+        if fields is not None:
+            unknown = set(fields) - set(Menu.model_fields) - {"_id"}
+            if unknown:
+                raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+
+        # קטגוריות דורשות הרכבה (split) ופתרון תפריטי סניף, לכן עוברות דרך המודל המלא
+        if fields is None or "categories" in fields:
+            cached = [effective_menu_cache.get(str(object_id)) for object_id in object_ids]
+            menus = [menu for menu in cached if menu is not None]
+            to_fetch = [object_id for object_id, menu in zip(object_ids, cached) if menu is None]
+            if to_fetch:
+                menus += await cls._find_assembled({"_id": {"$in": to_fetch}})
+            if fields is None:
+                return {str(menu.id): menu for menu in menus}
+            return {
+                str(menu.id): {"_id": str(menu.id), **menu.model_dump(include=set(fields))}
+                for menu in menus
+            }
+
+        pipeline = [
+            {"$match": {"_id": {"$in": object_ids}}},
+            {"$project": {field: 1 for field in fields}},
+        ]
+        docs = await Menu.aggregate(pipeline).to_list()
+        return {str(doc["_id"]): {**doc, "_id": str(doc["_id"])} for doc in docs}
+
+    @classmethod
+    async def get_active_menus(cls) -> List[Menu]:
+        """Retrieves all active menus for the public listing"""
+        return await cls._find_assembled({"is_active": True})
+
     @classmethod
     async def get_user_menus(cls, owner_id: str) -> List[Menu]:
         """Retrieves all menus belonging to a specific user"""
         return await Menu.find(Menu.owner_id == owner_id).to_list()
 
+    @classmethod
+    async def get_menu_categories(cls, menu_id: str) -> Optional[List[MenuCategorySummary]]:
+        """
+        Lists the categories of a menu with their dish counts, without shipping the dishes.
+        Returns None if the menu does not exist.
+        """
+        view = await cls._get_storage_view(menu_id)
+        if not view:
+            return None
+
+        if view.template_id:
+            menu = await cls.get_menu(menu_id)
+            return [
+                MenuCategorySummary(name=category.name, item_count=len(category.items))
+                for category in menu.categories
+            ]
+
+        if view.storage == MenuStorage.SPLIT:
+            pipeline = [
+                {"$match": {"menu_id": menu_id}},
+                {"$sort": {"position": 1}},
+                {"$addFields": {"_category_key": {"$toString": "$_id"}}},
+                {"$lookup": {
+                    "from": "menu_item_buckets",
+                    "localField": "_category_key",
+                    "foreignField": "category_id",
+                    "pipeline": [{"$project": {"_id": 0, "item_count": 1}}],
+                    "as": "buckets",
+                }},
+                {"$project": {"_id": 0, "name": 1, "item_count": {"$sum": "$buckets.item_count"}}},
+            ]
+            return await MenuCategoryDocument.aggregate(
+                pipeline, projection_model=MenuCategorySummary
+            ).to_list()
+
+        pipeline = [
+            {"$match": {"_id": PydanticObjectId(menu_id)}},
+            {"$unwind": "$categories"},
+            {"$project": {
+                "_id": 0,
+                "name": "$categories.name",
+                "item_count": {"$size": "$categories.items"},
+            }},
+        ]
+        return await Menu.aggregate(pipeline, projection_model=MenuCategorySummary).to_list()
+
+    @classmethod
+    async def get_menu_category(cls, menu_id: str, category_name: str) -> Optional[MenuCategory]:
+        """
+        Retrieves a single category with its dishes.
+        Returns None if the menu or the category does not exist.
+        """
+        view = await cls._get_storage_view(menu_id)
+        if not view:
+            return None
+
+        if view.template_id:
+            menu = await cls.get_menu(menu_id)
+            return next((category for category in menu.categories if category.name == category_name), None)
+
+        if view.storage == MenuStorage.SPLIT:
+            category = await MenuCategoryDocument.find_one(
+                MenuCategoryDocument.menu_id == menu_id,
+                MenuCategoryDocument.name == category_name
+            )
+            if not category:
+                return None
+            buckets = await MenuItemBucket.find(
+                MenuItemBucket.category_id == str(category.id)
+            ).sort("+_id").to_list()
+            return MenuCategory(
+                name=category.name,
+                items=[item for bucket in buckets for item in bucket.items]
+            )
+
+        pipeline = [
+            {"$match": {"_id": PydanticObjectId(menu_id)}},
+            {"$project": {"categories": {"$filter": {
+                "input": "$categories",
+                "cond": {"$eq": ["$$this.name", category_name]},
+            }}}},
+            {"$unwind": "$categories"},
+            {"$replaceRoot": {"newRoot": "$categories"}},
+            {"$limit": 1},
+        ]
+        categories = await Menu.aggregate(pipeline, projection_model=MenuCategory).to_list()
+        return categories[0] if categories else None
+
+    @classmethod
+    async def _get_storage_view(cls, menu_id: str) -> Optional[_MenuStorageView]:
+        if not PydanticObjectId.is_valid(menu_id):
+            return None
+        return await Menu.find_one(
+            Menu.id == PydanticObjectId(menu_id)
+        ).project(_MenuStorageView)
+
+    @staticmethod
+    def _reject_branch_menu(menu: Menu):
+        """Branch menus take their dishes from the template and only change them through overrides"""
+        if menu.template_id:
+            raise HTTPException(
+                status_code=400,
+                detail=f"This is a branch menu of template {menu.template_id}. "
+                       f"Add dishes with PUT /menus/{menu.id}/overrides (extra_items), "
+                       f"or add them to the template itself."
+            )
+
     @classmethod
     async def add_category(cls, menu_id: str, category_name: str, user_id: str):
         """
@@ -37,9 +483,55 @@ class MenuService:
                 detail="You do not have permission to modify this menu"
             )
 
-        menu.categories.append(MenuCategory(name=category_name))
-        await menu.save()
-        return menu
+        cls._reject_branch_menu(menu)
+
+        if menu.storage != MenuStorage.SPLIT:
+            # $push מותנה ולא save(), כדי לא לדרוס כתיבה מקבילה או פיצול שהסתיים בינתיים
+            result = await Menu.get_motor_collection().update_one(
+                {
+                    "_id": menu.id,
+                    "storage": {"$ne": MenuStorage.SPLIT.value},
+                    "categories.name": {"$ne": category_name},
+                },
+                {"$push": {"categories": MenuCategory(name=category_name).model_dump()}}
+            )
+            if result.matched_count:
+                cls._invalidate_menu(menu)
+                return await cls.get_menu(menu_id)
+            # הקטגוריה כבר קיימת, או שהתפריט פוצל מאז שנקרא
+            view = await cls._get_storage_view(menu_id)
+            if not view:
+                raise HTTPException(status_code=404, detail="Menu not found")
+            if view.storage != MenuStorage.SPLIT:
+                raise HTTPException(status_code=409, detail="Category already exists")
+
+        await cls._insert_split_category(menu_id, category_name)
+        cls._invalidate_menu(menu)
+        return await cls.get_menu(menu_id)
+
+    @staticmethod
+    async def _insert_split_category(menu_id: str, category_name: str, attempts: int = 5):
+        """
+        Appends a category to a SPLIT menu.
+        The unique (menu_id, position) and (menu_id, name) indexes reject concurrent inserts
+        that took the same position, which are retried, and duplicate names.
+        """
+        for _ in range(attempts):
+            position = await MenuCategoryDocument.find(
+                MenuCategoryDocument.menu_id == menu_id
+            ).count()
+            try:
+                await MenuCategoryDocument(
+                    menu_id=menu_id, name=category_name, position=position
+                ).insert()
+                return
+            except DuplicateKeyError:
+                if await MenuCategoryDocument.find_one(
+                    MenuCategoryDocument.menu_id == menu_id,
+                    MenuCategoryDocument.name == category_name
+                ):
+                    raise HTTPException(status_code=409, detail="Category already exists")
+        raise HTTPException(status_code=409, detail="The menu is being changed concurrently, please retry")
 
     @classmethod
     async def add_item_to_category(cls, menu_id: str, category_name: str, item: MenuItem, user_id: str):
@@ -58,13 +550,121 @@ class MenuService:
                 detail="You do not have permission to modify this menu"
             )
             
-        for category in menu.categories:
-            if category.name == category_name:
-                category.items.append(item)
-                await menu.save()
+        cls._reject_branch_menu(menu)
+
+        if menu.storage != MenuStorage.SPLIT:
+            result = await Menu.get_motor_collection().update_one(
+                {
+                    "_id": menu.id,
+                    "storage": {"$ne": MenuStorage.SPLIT.value},
+                    "categories.name": category_name,
+                },
+                {"$push": {"categories.$.items": item.model_dump()}}
+            )
+            if result.matched_count:
+                cls._invalidate_menu(menu)
+                return await cls.get_menu(menu_id)
+            # הקטגוריה לא קיימת, או שהתפריט פוצל מאז שנקרא
+            view = await cls._get_storage_view(menu_id)
+            if not view or view.storage != MenuStorage.SPLIT:
+                raise HTTPException(status_code=404, detail="Category not found")
+
+        category = await MenuCategoryDocument.find_one(
+            MenuCategoryDocument.menu_id == menu_id,
+            MenuCategoryDocument.name == category_name
+        )
+        if not category:
+            raise HTTPException(status_code=404, detail="Category not found")
+        await cls._push_to_bucket(menu_id, str(category.id), [item])
+        cls._invalidate_menu(menu)
+        return await cls.get_menu(menu_id)
+
+    @staticmethod
+    async def _push_to_bucket(menu_id: str, category_id: str, items: List[MenuItem]):
+        """
+        Appends dishes to the newest non-full bucket of a category.
+        When every bucket is full the upsert opens a new one.
+        """
+        collection = MenuItemBucket.get_motor_collection()
+        for item in items:
+            await collection.update_one(
+                {
+                    "menu_id": menu_id,
+                    "category_id": category_id,
+                    "item_count": {"$lt": MenuItemBucket.BUCKET_SIZE},
+                },
+                {"$push": {"items": item.model_dump()}, "$inc": {"item_count": 1}},
+                upsert=True
+            )
+
+    @staticmethod
+    async def _delete_split_documents(menu_id: str):
+        await MenuCategoryDocument.find(MenuCategoryDocument.menu_id == menu_id).delete()
+        await MenuItemBucket.find(MenuItemBucket.menu_id == menu_id).delete()
+
+    @classmethod
+    async def split_menu(cls, menu: Menu, attempts: int = 3) -> Menu:
+        """
+        Moves an EMBEDDED menu to the SPLIT layout.
+        Category and bucket documents are written first and the header is flipped last,
+        so readers see either the old or the new layout. The flip only matches if the stored
+        categories are still the ones that were copied; if a write landed in between, the
+        copy is thrown away and redone. Safe to re-run after a failure.
+        """
+        if menu.storage == MenuStorage.SPLIT:
+            return menu
+
+        menu_id = str(menu.id)
+        collection = Menu.get_motor_collection()
+        for _ in range(attempts):
+            # הקטגוריות כפי שהן שמורות, כדי שהתנאי בהחלפה יתאים להן בדיוק
+            stored = await collection.find_one({"_id": menu.id}, {"storage": 1, "categories": 1})
+            if not stored:
+                raise HTTPException(status_code=404, detail="Menu not found")
+            if stored.get("storage") == MenuStorage.SPLIT.value:
+                menu.storage = MenuStorage.SPLIT
+                return menu
+
+            snapshot = stored.get("categories", [])
+            # ניקוי שאריות של הרצה קודמת שנקטעה באמצע
+            await cls._delete_split_documents(menu_id)
+            await cls._write_split_documents(menu_id, [MenuCategory(**category) for category in snapshot])
+
+            result = await collection.update_one(
+                {"_id": menu.id, "storage": {"$ne": MenuStorage.SPLIT.value}, "categories": snapshot},
+                {"$set": {"storage": MenuStorage.SPLIT.value, "categories": []}}
+            )
+            if result.modified_count:
+                cls._invalidate_menu(menu)
+                menu.storage = MenuStorage.SPLIT
                 return menu
-                
-        raise HTTPException(status_code=404, detail="Category not found")
+
+        await cls._delete_split_documents(menu_id)
+        raise HTTPException(
+            status_code=409,
+            detail=f"Menu {menu_id} kept changing while it was being split, please retry"
+        )
+
+    @staticmethod
+    async def _write_split_documents(menu_id: str, categories: List[MenuCategory]):
+        size = MenuItemBucket.BUCKET_SIZE
+        for position, category in enumerate(categories):
+            category_doc = MenuCategoryDocument(
+                menu_id=menu_id, name=category.name, position=position
+            )
+            await category_doc.insert()
+            buckets = [
+                MenuItemBucket(
+                    menu_id=menu_id,
+                    category_id=str(category_doc.id),
+                    item_count=len(category.items[start:start + size]),
+                    items=category.items[start:start + size]
+                )
+                for start in range(0, len(category.items), size)
+            ]
+            if buckets:
+                await MenuItemBucket.insert_many(buckets)
+
     @classmethod
     async def get_owner_menus(cls, owner_id: str) -> List[Menu]:
         """
@@ -72,7 +672,7 @@ class MenuService:
         Useful for the owner's management dashboard.
         """
         # We search the 'menus' collection where owner_id matches the user's ID
-        return await Menu.find(Menu.owner_id == owner_id).to_list()
+        return await cls._find_assembled({"owner_id": owner_id})
 
     @classmethod
     async def delete_menu(cls, menu_id: str, user_id: str) -> bool:
@@ -91,5 +691,14 @@ class MenuService:
                 detail="You do not have permission to delete this menu"
             )
             
+        if menu.is_template and await Menu.find(Menu.template_id == menu_id).count():
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="This template still has branch menus. Delete them first."
+            )
+
         await menu.delete()
-        return True
\ No newline at end of file
+        if menu.storage == MenuStorage.SPLIT:
+            await cls._delete_split_documents(menu_id)
+        cls._invalidate_menu(menu)
+        return True
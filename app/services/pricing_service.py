@@ -0,0 +1,269 @@
+# app/services/pricing_service.py
+from app.models import (
+    Menu, MenuStorage, MenuCategoryDocument, MenuItemBucket,
+    PriceAdjustment, RepriceRequest, RepriceSummary, IdView,
+)
+from app.cache import owner_stats_cache, effective_menu_cache
+from beanie import PydanticObjectId
+from fastapi import HTTPException, status
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+class _BranchView(BaseModel):
+    """A branch menu's id and the template it is built from"""
+    id: PydanticObjectId = Field(alias="_id")
+    template_id: str
+
+class PricingService:
+    @staticmethod
+    def _price_expr(rule: RepriceRequest, price: str) -> dict:
+        """
+        Builds the aggregation expression of the new price from the field path `price`.
+        Prices never go below zero and are kept to two decimals.
+        """
+        if rule.adjustment == PriceAdjustment.PERCENTAGE:
+            expr = {"$multiply": [price, 1 + rule.value / 100]}
+        else:
+            expr = {"$add": [price, rule.value]}
+
+        if rule.round_to_ending is not None:
+            # עיגול כלפי מעלה לסיומת הקרובה, למשל 12.34 -> 12.90.
+            # קודם מעגלים לאגורות: 18.00 * 1.05 הוא 18.900000000000002 ובלי זה היה הופך ל-19.90
+            ending = rule.round_to_ending
+            expr = {"$add": [{"$ceil": {"$subtract": [{"$round": [expr, 2]}, ending]}}, ending]}
+
+        return {"$round": [{"$max": [expr, 0]}, 2]}
+
+    @staticmethod
+    def _menu_filter(rule: RepriceRequest, owner_id: str) -> dict:
+        """Filter on the menus collection for the scope of the rule, always limited to the owner"""
+        menu_filter = {"owner_id": owner_id}
+        if rule.restaurant_ids is not None:
+            menu_filter["restaurant_id"] = {"$in": rule.restaurant_ids}
+        if rule.menu_ids is not None:
+            invalid = [menu_id for menu_id in rule.menu_ids if not PydanticObjectId.is_valid(menu_id)]
+            if invalid:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Invalid menu ids: {', '.join(invalid)}"
+                )
+            menu_filter["_id"] = {"$in": [PydanticObjectId(menu_id) for menu_id in rule.menu_ids]}
+        return menu_filter
+
+    @classmethod
+    async def _scope_filter(cls, rule: RepriceRequest, owner_id: str) -> dict:
+        """
+        The menu filter of the rule, extended with the templates behind the branch menus in scope,
+        since branch menus keep their dishes in the template. A template is only repriced when all
+        of its branches are in scope; otherwise the change would reach branches outside it too.
+        """
+        menu_filter = cls._menu_filter(rule, owner_id)
+        branches = await Menu.find(
+            {**menu_filter, "template_id": {"$ne": None}}
+        ).project(_BranchView).to_list()
+        template_ids = {branch.template_id for branch in branches if PydanticObjectId.is_valid(branch.template_id)}
+        if not template_ids:
+            return menu_filter
+
+        outside = await Menu.find(
+            {"template_id": {"$in": list(template_ids)}, "_id": {"$nin": [branch.id for branch in branches]}}
+        ).project(_BranchView).to_list()
+        if outside:
+            shared = sorted({branch.template_id for branch in outside})
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Templates {', '.join(shared)} also serve branch menus outside this scope. "
+                       f"Reprice the template through menu_ids to change every branch, "
+                       f"or change single branches with price overrides."
+            )
+        return {"$or": [
+            menu_filter,
+            {"owner_id": owner_id, "_id": {"$in": [PydanticObjectId(template_id) for template_id in template_ids]}},
+        ]}
+
+    @classmethod
+    async def _bucket_filter(cls, rule: RepriceRequest, menu_filter: dict) -> Optional[dict]:
+        """Filter on menu_item_buckets for the SPLIT menus in scope, or None if there are none"""
+        split_filter = {**menu_filter, "storage": MenuStorage.SPLIT.value}
+        menus = await Menu.find(split_filter).project(IdView).to_list()
+        if not menus:
+            return None
+
+        menu_ids = [str(menu.id) for menu in menus]
+        bucket_filter = {"menu_id": {"$in": menu_ids}}
+        if rule.category_name is not None:
+            categories = await MenuCategoryDocument.find(
+                {"menu_id": {"$in": menu_ids}, "name": rule.category_name}
+            ).project(IdView).to_list()
+            if not categories:
+                return None
+            bucket_filter["category_id"] = {"$in": [str(category.id) for category in categories]}
+        return bucket_filter
+
+    @classmethod
+    def _summary_stages(cls, rule: RepriceRequest, price: str, menu_key: str) -> List[dict]:
+        """Stages that turn one document per dish into a single summary document"""
+        return [
+            {"$project": {"menu_key": menu_key, "old": price, "new": cls._price_expr(rule, price)}},
+            {"$group": {
+                "_id": None,
+                "menus": {"$addToSet": "$menu_key"},
+                "items_matched": {"$sum": 1},
+                "items_changed": {"$sum": {"$cond": [{"$ne": ["$old", "$new"]}, 1, 0]}},
+                "total_before": {"$sum": "$old"},
+                "total_after": {"$sum": "$new"},
+            }},
+            {"$project": {
+                "_id": 0,
+                "menus_matched": {"$size": "$menus"},
+                "items_matched": 1,
+                "items_changed": 1,
+                "total_before": 1,
+                "total_after": 1,
+            }},
+        ]
+
+    @staticmethod
+    def _override_filter(rule: RepriceRequest, menu_filter: dict) -> dict:
+        """Filter on the branch menus in scope whose overrides hold prices the rule applies to"""
+        if rule.category_name is None:
+            priced = [{"overrides.prices.0": {"$exists": True}}, {"overrides.extra_items.0": {"$exists": True}}]
+        else:
+            priced = [{"overrides.prices.category": rule.category_name},
+                      {"overrides.extra_items.category": rule.category_name}]
+        return {"$and": [menu_filter, {"template_id": {"$ne": None}}, {"$or": priced}]}
+
+    @staticmethod
+    def _for_category(rule: RepriceRequest, category: str, updated: dict, unchanged: str) -> dict:
+        """`updated` for entries of the rule's category (or of any category), `unchanged` for the rest"""
+        if rule.category_name is None:
+            return updated
+        return {"$cond": [{"$eq": [category, rule.category_name]}, updated, unchanged]}
+
+    @classmethod
+    async def reprice(cls, rule: RepriceRequest, owner_id: str) -> RepriceSummary:
+        """
+        Applies a bulk price change to every dish in scope with update pipelines,
+        so the new prices are computed inside Mongo and no menu is loaded into Python.
+        Branch menus in scope bring in their template and their own override prices.
+        On a dry run only the summary is computed.
+        """
+        menu_filter = await cls._scope_filter(rule, owner_id)
+        embedded_filter = {**menu_filter, "storage": {"$ne": MenuStorage.SPLIT.value}}
+        if rule.category_name is not None:
+            embedded_filter["categories.name"] = rule.category_name
+        bucket_filter = await cls._bucket_filter(rule, menu_filter)
+        override_filter = cls._override_filter(rule, menu_filter)
+
+        # --- סיכום השינוי (גם בהרצה יבשה) ---
+        embedded_pipeline = [
+            {"$match": embedded_filter},
+            {"$unwind": "$categories"},
+        ]
+        if rule.category_name is not None:
+            embedded_pipeline.append({"$match": {"categories.name": rule.category_name}})
+        embedded_pipeline += [
+            {"$unwind": "$categories.items"},
+            *cls._summary_stages(rule, "$categories.items.price", "$_id"),
+        ]
+        partials = await Menu.aggregate(embedded_pipeline).to_list()
+
+        if bucket_filter:
+            bucket_pipeline = [
+                {"$match": bucket_filter},
+                {"$unwind": "$items"},
+                *cls._summary_stages(rule, "$items.price", "$menu_id"),
+            ]
+            partials += await MenuItemBucket.aggregate(bucket_pipeline).to_list()
+
+        # מחירים שסניפים דורסים או מוסיפים (overrides) הם חלק מהתחום של הסניף
+        override_pipeline = [
+            {"$match": override_filter},
+            {"$project": {"entries": {"$concatArrays": [
+                {"$ifNull": ["$overrides.prices", []]},
+                {"$map": {
+                    "input": {"$ifNull": ["$overrides.extra_items", []]},
+                    "as": "extra",
+                    "in": {"category": "$$extra.category", "price": "$$extra.item.price"},
+                }},
+            ]}}},
+            {"$unwind": "$entries"},
+        ]
+        if rule.category_name is not None:
+            override_pipeline.append({"$match": {"entries.category": rule.category_name}})
+        override_pipeline += cls._summary_stages(rule, "$entries.price", "$_id")
+        partials += await Menu.aggregate(override_pipeline).to_list()
+
+        summary = RepriceSummary(dry_run=rule.dry_run)
+        for partial in partials:
+            summary.menus_matched += partial["menus_matched"]
+            summary.items_matched += partial["items_matched"]
+            summary.items_changed += partial["items_changed"]
+            summary.total_before += partial["total_before"]
+            summary.total_after += partial["total_after"]
+        summary.total_before = round(summary.total_before, 2)
+        summary.total_after = round(summary.total_after, 2)
+
+        if rule.dry_run or summary.items_changed == 0:
+            return summary
+
+        # --- החלת השינוי ---
+        items_expr = {"$map": {
+            "input": "$$category.items",
+            "as": "item",
+            "in": {"$mergeObjects": ["$$item", {"price": cls._price_expr(rule, "$$item.price")}]},
+        }}
+        category_expr = {"$mergeObjects": ["$$category", {"items": items_expr}]}
+        if rule.category_name is not None:
+            category_expr = {"$cond": [
+                {"$eq": ["$$category.name", rule.category_name]}, category_expr, "$$category"
+            ]}
+        result = await Menu.get_motor_collection().update_many(
+            embedded_filter,
+            [{"$set": {"categories": {"$map": {
+                "input": "$categories", "as": "category", "in": category_expr,
+            }}}}]
+        )
+        summary.documents_modified += result.modified_count
+
+        if bucket_filter:
+            result = await MenuItemBucket.get_motor_collection().update_many(
+                bucket_filter,
+                [{"$set": {"items": {"$map": {
+                    "input": "$items",
+                    "as": "item",
+                    "in": {"$mergeObjects": ["$$item", {"price": cls._price_expr(rule, "$$item.price")}]},
+                }}}}]
+            )
+            summary.documents_modified += result.modified_count
+
+        result = await Menu.get_motor_collection().update_many(
+            override_filter,
+            [{"$set": {
+                "overrides.prices": {"$map": {
+                    "input": {"$ifNull": ["$overrides.prices", []]},
+                    "as": "override",
+                    "in": cls._for_category(
+                        rule, "$$override.category",
+                        {"$mergeObjects": ["$$override", {"price": cls._price_expr(rule, "$$override.price")}]},
+                        "$$override"
+                    ),
+                }},
+                "overrides.extra_items": {"$map": {
+                    "input": {"$ifNull": ["$overrides.extra_items", []]},
+                    "as": "extra",
+                    "in": cls._for_category(
+                        rule, "$$extra.category",
+                        {"$mergeObjects": ["$$extra", {"item": {"$mergeObjects": [
+                            "$$extra.item", {"price": cls._price_expr(rule, "$$extra.item.price")}
+                        ]}}]},
+                        "$$extra"
+                    ),
+                }},
+            }}]
+        )
+        summary.documents_modified += result.modified_count
+
+        owner_stats_cache.invalidate(owner_id)
+        effective_menu_cache.invalidate_tag(f"owner:{owner_id}")
+        return summary
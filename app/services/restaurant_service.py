@@ -1,36 +1,213 @@
 # app/services/restaurant_service.py
-from app.models import Restaurant, Menu
-from typing import List
+from app.models import AvailabilityWindow, Restaurant, Menu, RestaurantStats, RestaurantSuggestion
+from app.search import normalize_search_text
+from app.services.menu_service import MenuService
+from app.services.schedule_service import DEFAULT_TIMEZONE, get_zone, menu_scheduler
+from app.cache import owner_stats_cache, effective_menu_cache
+from beanie import PydanticObjectId
+from fastapi import HTTPException
+from pydantic import BaseModel, Field
+from typing import Dict, List, Optional, Union
 import logging
+import re
 from pymongo.errors import PyMongoError
 
 logger = logging.getLogger(__name__)
 
+class _RestaurantNameView(BaseModel):
+    """Projection of a restaurant used to label dashboard numbers"""
+    id: PydanticObjectId = Field(alias="_id")
+    name: str
+
 class RestaurantService:
     @classmethod
-    async def create_restaurant(cls, name: str, location: str, owner_id: str, image_url: str = None):
+    async def create_restaurant(cls, name: str, location: str, owner_id: str, image_url: str = None, timezone: str = DEFAULT_TIMEZONE):
+        if not get_zone(timezone):
+            raise HTTPException(status_code=400, detail=f"Unknown timezone: {timezone}")
         restaurant = Restaurant(
             name=name,
             location=location,
             owner_id=owner_id,
-            image_url=image_url
+            image_url=image_url,
+            timezone=timezone
         )
         await restaurant.insert()
+        owner_stats_cache.invalidate(owner_id)
         return restaurant
 
     @classmethod
     async def get_owner_restaurants(cls, owner_id: str) -> List[Restaurant]:
         return await Restaurant.find(Restaurant.owner_id == owner_id).to_list()
 
+    @classmethod
+    async def get_restaurants_by_ids(cls, restaurant_ids: List[str], fields: Optional[List[str]] = None) -> Dict[str, Union[Restaurant, dict]]:
+        """
+        Fetches many restaurants with a single $in query, keyed by id.
+        Unknown and invalid ids are simply missing from the result.
+        When `fields` is given only those fields (and _id) are returned, as plain dicts.
+        """
+        object_ids = [PydanticObjectId(rid) for rid in restaurant_ids if PydanticObjectId.is_valid(rid)]
+        if not object_ids:
+            return {}
+
+        if fields is None:
+            restaurants = await Restaurant.find({"_id": {"$in": object_ids}}).to_list()
+            return {str(restaurant.id): restaurant for restaurant in restaurants}
+
+        unknown = set(fields) - set(Restaurant.model_fields) - {"_id"}
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+
+        docs = await Restaurant.aggregate([
+            {"$match": {"_id": {"$in": object_ids}}},
+            {"$project": {field: 1 for field in fields}},
+        ]).to_list()
+        return {str(doc["_id"]): {**doc, "_id": str(doc["_id"])} for doc in docs}
+
     @classmethod
     async def toggle_menu_status(cls, menu_id: str, restaurant_id: str, owner_id: str, active: bool):
         menu = await Menu.get(menu_id)
         if menu and menu.restaurant_id == restaurant_id and menu.owner_id == owner_id:
-            menu.is_active = active
-            await menu.save()
-            return menu
+            # עדכון חלקי ולא save(), כדי לא לדרוס קטגוריות שנכתבו או פוצלו בינתיים
+            await menu.set({Menu.is_active: active})
+            owner_stats_cache.invalidate(owner_id)
+            effective_menu_cache.invalidate(menu_id)
+            return await MenuService.get_menu(menu_id)
         return None
 
+    @classmethod
+    async def set_menu_schedule(cls, menu_id: str, restaurant_id: str, owner_id: str, schedule: List[AvailabilityWindow]):
+        """
+        Replaces the availability windows of a menu and hands it to the scheduler,
+        which sets is_active for now and at every later transition. An empty list stops scheduling.
+        """
+        menu = await Menu.get(menu_id)
+        if not menu or menu.restaurant_id != restaurant_id or menu.owner_id != owner_id:
+            return None
+        if menu.is_template:
+            raise HTTPException(status_code=400, detail="Templates are never active; schedule the branch menus instead")
+
+        await menu.set({Menu.schedule: [window.model_dump() for window in schedule]})
+        effective_menu_cache.invalidate(menu_id)
+        await menu_scheduler.refresh(menu_id)
+        return await MenuService.get_menu(menu_id)
+
+    @classmethod
+    async def get_owner_stats(cls, owner_id: str) -> List[RestaurantStats]:
+        """
+        Counts menus, categories and dishes and summarizes prices per restaurant of an owner.
+        Computed inside Mongo and cached per owner until one of their menus changes.
+        """
+        cached = owner_stats_cache.get(owner_id)
+        if cached is not None:
+            return cached
+
+        pipeline = [
+            # תבניות רשת אינן שייכות למסעדה ולא נספרות
+            {"$match": {"owner_id": owner_id, "is_template": {"$ne": True}}},
+            *MenuService.assemble_stages(),
+            # תפריטי סניף נספרים לפי התפריט האפקטיבי שלהם (תבנית + שינויים)
+            *MenuService.resolve_branch_stages(),
+            {"$addFields": {"category_count": {"$size": "$categories"}}},
+            {"$unwind": {"path": "$categories", "preserveNullAndEmptyArrays": True}},
+            {"$unwind": {"path": "$categories.items", "preserveNullAndEmptyArrays": True}},
+            # שלב 1: סיכום לכל תפריט
+            {"$group": {
+                "_id": "$_id",
+                "restaurant_id": {"$first": "$restaurant_id"},
+                "is_active": {"$first": "$is_active"},
+                "category_count": {"$first": "$category_count"},
+                "item_count": {"$sum": {"$cond": [{"$ifNull": ["$categories.items", False]}, 1, 0]}},
+                "unavailable_item_count": {"$sum": {
+                    "$cond": [{"$eq": ["$categories.items.is_available", False]}, 1, 0]
+                }},
+                "min_price": {"$min": "$categories.items.price"},
+                "max_price": {"$max": "$categories.items.price"},
+                "price_sum": {"$sum": "$categories.items.price"},
+            }},
+            # שלב 2: סיכום לכל מסעדה
+            {"$group": {
+                "_id": "$restaurant_id",
+                "menu_count": {"$sum": 1},
+                "active_menu_count": {"$sum": {"$cond": ["$is_active", 1, 0]}},
+                "category_count": {"$sum": "$category_count"},
+                "item_count": {"$sum": "$item_count"},
+                "unavailable_item_count": {"$sum": "$unavailable_item_count"},
+                "min_price": {"$min": "$min_price"},
+                "max_price": {"$max": "$max_price"},
+                "price_sum": {"$sum": "$price_sum"},
+            }},
+            {"$project": {
+                "_id": 0,
+                "restaurant_id": "$_id",
+                "menu_count": 1,
+                "active_menu_count": 1,
+                "active_menu_ratio": {"$round": [{"$divide": ["$active_menu_count", "$menu_count"]}, 4]},
+                "category_count": 1,
+                "item_count": 1,
+                "unavailable_item_count": 1,
+                "unavailable_item_ratio": {"$cond": [
+                    {"$gt": ["$item_count", 0]},
+                    {"$round": [{"$divide": ["$unavailable_item_count", "$item_count"]}, 4]},
+                    0.0,
+                ]},
+                "min_price": 1,
+                "max_price": 1,
+                "avg_price": {"$cond": [
+                    {"$gt": ["$item_count", 0]},
+                    {"$round": [{"$divide": ["$price_sum", "$item_count"]}, 2]},
+                    None,
+                ]},
+            }},
+        ]
+        menu_stats = await Menu.aggregate(pipeline, projection_model=RestaurantStats).to_list()
+        stats_by_restaurant = {stats.restaurant_id: stats for stats in menu_stats}
+
+        # גם מסעדות בלי תפריטים מופיעות בדשבורד
+        restaurants = await Restaurant.find(
+            Restaurant.owner_id == owner_id
+        ).project(_RestaurantNameView).to_list()
+        result = []
+        for restaurant in restaurants:
+            stats = stats_by_restaurant.pop(str(restaurant.id), None) or RestaurantStats(
+                restaurant_id=str(restaurant.id)
+            )
+            stats.restaurant_name = restaurant.name
+            result.append(stats)
+        result.extend(stats_by_restaurant.values())
+
+        owner_stats_cache.set(owner_id, result)
+        return result
+
+    @classmethod
+    async def suggest_restaurants(cls, query: str, limit: int = 10) -> List[RestaurantSuggestion]:
+        """
+        Autocomplete over active restaurants: matches the typed prefix against the start
+        of any word of the name, ignoring case, diacritics and Hebrew final letters.
+        An anchored regex on the search_terms index is a bounded index range scan.
+        Names that start with the prefix come first, then names with a later word that does;
+        each group is sorted by name.
+        """
+        prefix = normalize_search_text(query)
+        if not prefix:
+            return []
+
+        term = {"$regex": f"^{re.escape(prefix)}"}
+        matches = {"search_terms": term, "is_active": True}
+        # search_terms[0] הוא השם המלא, לכן התאמה בו היא התאמה מתחילת השם
+        name_matches = await Restaurant.find(
+            {**matches, "search_terms.0": term}
+        ).limit(limit).project(RestaurantSuggestion).to_list()
+
+        word_matches = []
+        if len(name_matches) < limit:
+            word_matches = await Restaurant.find(
+                {**matches, "_id": {"$nin": [suggestion.id for suggestion in name_matches]}}
+            ).limit(limit - len(name_matches)).project(RestaurantSuggestion).to_list()
+
+        by_name = lambda suggestion: suggestion.name.casefold()
+        return sorted(name_matches, key=by_name) + sorted(word_matches, key=by_name)
+
     @staticmethod
     async def get_all_restaurants() -> List[Restaurant]:
         """מאחזר את כל המסעדות הפעילות מהדאטהבייס"""
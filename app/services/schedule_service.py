@@ -0,0 +1,271 @@
+# app/services/schedule_service.py
+import asyncio
+import heapq
+import os
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from beanie import PydanticObjectId
+from pydantic import BaseModel, Field
+
+from app.cache import owner_stats_cache, effective_menu_cache
+from app.logger import logger
+from app.models import AvailabilityWindow, Menu, Restaurant
+
+MENU_SCHEDULER_ENABLED = os.getenv("MENU_SCHEDULER_ENABLED", "true").lower() == "true"
+# כל כמה זמן טוענים מחדש את כל הלוחות, כדי לקלוט שינויים שנעשו ב-workers אחרים
+MENU_SCHEDULER_RELOAD_SECONDS = float(os.getenv("MENU_SCHEDULER_RELOAD_SECONDS", 300))
+# מעבר שנכשל (למשל שגיאת מונגו רגעית) מנוסה שוב אחרי זמן זה
+MENU_SCHEDULER_RETRY_SECONDS = float(os.getenv("MENU_SCHEDULER_RETRY_SECONDS", 5))
+DEFAULT_TIMEZONE = "Asia/Jerusalem"
+
+
+class _ScheduledMenuView(BaseModel):
+    """The fields the scheduler needs, without categories"""
+    id: PydanticObjectId = Field(alias="_id")
+    restaurant_id: str
+    owner_id: str
+    schedule: List[AvailabilityWindow] = []
+
+
+class _TimezoneView(BaseModel):
+    id: PydanticObjectId = Field(alias="_id")
+    timezone: str = DEFAULT_TIMEZONE
+
+
+def get_zone(name: str) -> Optional[ZoneInfo]:
+    """Returns the ZoneInfo for an IANA name, or None if it is unknown"""
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return None
+
+
+def _window_bounds(window: AvailabilityWindow, day: date, tz: ZoneInfo) -> Tuple[datetime, datetime]:
+    """Start and end (in UTC) of a window that opens on `day`"""
+    start_h, start_m = map(int, window.start.split(":"))
+    end_h, end_m = map(int, window.end.split(":"))
+    start = datetime(day.year, day.month, day.day, start_h, start_m, tzinfo=tz)
+    end_day = day if (end_h, end_m) > (start_h, start_m) else day + timedelta(days=1)
+    end = datetime(end_day.year, end_day.month, end_day.day, end_h, end_m, tzinfo=tz)
+    return start.astimezone(timezone.utc), end.astimezone(timezone.utc)
+
+
+def _windows_around(windows: Iterable[AvailabilityWindow], moment: datetime, tz: ZoneInfo, days_ahead: int):
+    """Every (start, end) of the windows from the day before `moment` up to `days_ahead` days after"""
+    today = moment.astimezone(tz).date()
+    for offset in range(-1, days_ahead + 1):
+        day = today + timedelta(days=offset)
+        for window in windows:
+            if day.weekday() in window.days:
+                yield _window_bounds(window, day, tz)
+
+
+def is_open_at(windows: List[AvailabilityWindow], tz: ZoneInfo, moment: datetime) -> bool:
+    """Whether any window covers `moment` (an aware datetime)"""
+    return any(start <= moment < end for start, end in _windows_around(windows, moment, tz, 0))
+
+
+def next_transition(windows: List[AvailabilityWindow], tz: ZoneInfo, after: datetime) -> Optional[datetime]:
+    """The first window start or end strictly after `after`, in UTC; None without windows"""
+    boundaries = [
+        bound
+        for start, end in _windows_around(windows, after, tz, 7)
+        for bound in (start, end)
+        if bound > after
+    ]
+    return min(boundaries, default=None)
+
+
+class MenuScheduler:
+    """
+    Flips Menu.is_active at the transition times of the menus' availability windows,
+    so public reads stay a plain indexed lookup on is_active.
+
+    Keeps one entry per scheduled menu in a heap ordered by its next transition and
+    sleeps until the earliest one. When it fires, the menu's schedule is re-read from Mongo,
+    the state for "now" is written (only if it differs) and the next transition is queued.
+    Everything runs in a background task, so startup does not wait for the menus to load.
+    Every worker runs its own scheduler; the writes are idempotent, and a periodic reload
+    picks up schedules changed through other workers.
+    """
+
+    def __init__(self, reload_seconds: float = MENU_SCHEDULER_RELOAD_SECONDS):
+        self.reload_seconds = reload_seconds
+        self._queue: List[Tuple[float, str]] = []
+        self._next: Dict[str, float] = {}  # menu_id -> timestamp of its live heap entry
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._retrying: Set[str] = set()  # menus whose transition failed and waits for a retry
+
+    def start(self):
+        """Must be called from the running event loop"""
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+
+    async def reload(self, apply_state: bool = False):
+        """
+        Loads every scheduled menu and queues its next transition.
+        The current state is only written with apply_state, so a manual status change
+        made between two transitions is kept until the next one.
+        """
+        menus = await Menu.find(
+            {"schedule.start": {"$exists": True}}
+        ).project(_ScheduledMenuView).to_list()
+        timezones = await self._timezones({menu.restaurant_id for menu in menus})
+
+        now = datetime.now(timezone.utc)
+        if apply_state:
+            await self._apply_states(menus, timezones, now)
+        for menu in menus:
+            self._queue_next(menu, timezones.get(menu.restaurant_id, DEFAULT_TIMEZONE), now)
+
+        # לוחות שנמחקו דרך worker אחר
+        scheduled = {str(menu.id) for menu in menus}
+        for menu_id in set(self._next) - scheduled:
+            del self._next[menu_id]
+            self._retrying.discard(menu_id)
+        self._wake()
+
+    async def refresh(self, menu_id: str):
+        """Re-reads the schedule of one menu after it changed, applies it and re-queues it"""
+        await self.refresh_many([menu_id])
+
+    async def refresh_many(self, menu_ids: List[str]):
+        """Like refresh, for many menus with a fixed number of queries (e.g. after a clone)"""
+        object_ids = [PydanticObjectId(menu_id) for menu_id in menu_ids if PydanticObjectId.is_valid(menu_id)]
+        menus = await Menu.find(
+            {"_id": {"$in": object_ids}, "schedule.start": {"$exists": True}}
+        ).project(_ScheduledMenuView).to_list()
+        scheduled = {str(menu.id) for menu in menus}
+        for menu_id in set(menu_ids) - scheduled:
+            self._next.pop(menu_id, None)
+            self._retrying.discard(menu_id)
+        if not menus:
+            return
+
+        timezones = await self._timezones({menu.restaurant_id for menu in menus})
+        now = datetime.now(timezone.utc)
+        await self._apply_states(menus, timezones, now)
+        for menu in menus:
+            self._queue_next(menu, timezones.get(menu.restaurant_id, DEFAULT_TIMEZONE), now)
+        self._wake()
+
+    @staticmethod
+    async def _timezones(restaurant_ids: Set[str]) -> Dict[str, str]:
+        object_ids = [PydanticObjectId(rid) for rid in restaurant_ids if PydanticObjectId.is_valid(rid)]
+        if not object_ids:
+            return {}
+        restaurants = await Restaurant.find(
+            {"_id": {"$in": object_ids}}
+        ).project(_TimezoneView).to_list()
+        return {str(restaurant.id): restaurant.timezone for restaurant in restaurants}
+
+    @staticmethod
+    async def _apply_states(menus: List[_ScheduledMenuView], timezones: Dict[str, str], now: datetime):
+        """
+        Writes the state of every menu for `now` with one conditional update_many per state,
+        so menus that already have it are left alone.
+        """
+        states: Dict[bool, List[_ScheduledMenuView]] = {True: [], False: []}
+        for menu in menus:
+            tz = get_zone(timezones.get(menu.restaurant_id, DEFAULT_TIMEZONE)) or ZoneInfo(DEFAULT_TIMEZONE)
+            states[is_open_at(menu.schedule, tz, now)].append(menu)
+
+        for active, group in states.items():
+            if not group:
+                continue
+            result = await Menu.get_motor_collection().update_many(
+                {"_id": {"$in": [menu.id for menu in group]}, "is_active": {"$ne": active}},
+                {"$set": {"is_active": active}}
+            )
+            if result.modified_count:
+                logger.info(f"Scheduler {'activated' if active else 'deactivated'} {result.modified_count} menus")
+                # לא ידוע אילו מהקבוצה השתנו בפועל, לכן מנקים את כולם
+                for menu in group:
+                    effective_menu_cache.invalidate(str(menu.id))
+                    owner_stats_cache.invalidate(menu.owner_id)
+
+    def _queue_next(self, menu: _ScheduledMenuView, timezone_name: str, now: datetime):
+        menu_id = str(menu.id)
+        if menu_id in self._retrying:
+            # הניסיון החוזר יחיל את המצב ויתזמן את המעבר הבא; לא דורסים אותו כאן
+            return
+        tz = get_zone(timezone_name) or ZoneInfo(DEFAULT_TIMEZONE)
+        when = next_transition(menu.schedule, tz, now)
+        if when is None:
+            self._next.pop(menu_id, None)
+            return
+        timestamp = when.timestamp()
+        if self._next.get(menu_id) != timestamp:
+            self._next[menu_id] = timestamp
+            heapq.heappush(self._queue, (timestamp, menu_id))
+
+    def _wake(self):
+        if self._wakeup:
+            self._wakeup.set()
+
+    async def _run(self):
+        # בעלייה מיישמים גם את המצב הנוכחי, למקרה שמעבר התפספס בזמן שהשרת היה למטה
+        while True:
+            try:
+                await self.reload(apply_state=True)
+                break
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Menu scheduler failed to load schedules: {str(e)}")
+                await asyncio.sleep(5)
+        logger.info(f"Menu scheduler started with {len(self._next)} scheduled menus")
+
+        last_reload = time.time()
+        while True:
+            try:
+                # רשומות ישנות (הלוח השתנה מאז) נזרקות בשליפה
+                while self._queue and self._next.get(self._queue[0][1]) != self._queue[0][0]:
+                    heapq.heappop(self._queue)
+
+                now = time.time()
+                timeout = self.reload_seconds - (now - last_reload)
+                if self._queue:
+                    timeout = min(timeout, self._queue[0][0] - now)
+
+                if timeout > 0:
+                    self._wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), timeout)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+
+                if now - last_reload >= self.reload_seconds:
+                    await self.reload()
+                    last_reload = time.time()
+                    continue
+
+                _, menu_id = heapq.heappop(self._queue)
+                del self._next[menu_id]
+                self._retrying.discard(menu_id)
+                try:
+                    await self.refresh(menu_id)
+                except Exception as e:
+                    # בלי זה המעבר היה הולך לאיבוד: reload תקופתי רק מתזמן את המעבר הבא
+                    logger.error(f"Menu scheduler failed to apply menu {menu_id}, retrying: {str(e)}")
+                    retry_at = time.time() + MENU_SCHEDULER_RETRY_SECONDS
+                    self._next[menu_id] = retry_at
+                    self._retrying.add(menu_id)
+                    heapq.heappush(self._queue, (retry_at, menu_id))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Menu scheduler error: {str(e)}")
+                await asyncio.sleep(5)
+
+
+menu_scheduler = MenuScheduler()
@@ -0,0 +1,68 @@
+import math
+
+import pytest
+from pydantic import ValidationError
+
+from app.models import PriceAdjustment, RepriceRequest
+from app.services.pricing_service import PricingService
+
+# The aggregation operators _price_expr uses, evaluated in Python on doubles like Mongo does
+_OPERATORS = {
+    "$add": lambda args: sum(args),
+    "$subtract": lambda args: args[0] - args[1],
+    "$multiply": lambda args: math.prod(args),
+    "$max": lambda args: max(args),
+    "$ceil": lambda arg: float(math.ceil(arg)),
+    "$round": lambda args: round(args[0], args[1]),
+}
+
+
+def evaluate(expr, price: float) -> float:
+    if isinstance(expr, str):
+        assert expr == "$price"
+        return price
+    if isinstance(expr, dict):
+        (operator, args), = expr.items()
+        if isinstance(args, list):
+            return _OPERATORS[operator]([evaluate(arg, price) for arg in args])
+        return _OPERATORS[operator](evaluate(args, price))
+    return expr
+
+
+def new_price(price: float, **rule) -> float:
+    return evaluate(PricingService._price_expr(RepriceRequest(**rule), "$price"), price)
+
+
+@pytest.mark.parametrize("price, value, expected", [
+    (18.00, 5, 18.90),  # 18 * 1.05 == 18.900000000000002
+    (21.00, -10, 18.90),  # 21 * 0.9 == 18.900000000000002
+    (12.34, 0, 12.90),
+    (12.90, 0, 12.90),
+    (12.91, 0, 13.90),
+])
+def test_percentage_rounds_up_to_ending(price, value, expected):
+    assert new_price(price, value=value, round_to_ending=0.9) == expected
+
+
+def test_absolute_rounds_up_to_ending():
+    assert new_price(17.95, adjustment=PriceAdjustment.ABSOLUTE, value=0.95, round_to_ending=0.9) == 18.90
+
+
+def test_round_to_whole_number():
+    assert new_price(18.00, value=5, round_to_ending=0.0) == 19.00
+    assert new_price(20.00, value=-10, round_to_ending=0.0) == 18.00
+
+
+def test_without_ending_keeps_two_decimals():
+    assert new_price(18.00, value=5) == 18.90
+    assert new_price(9.99, value=1) == 10.09
+
+
+def test_never_below_zero():
+    assert new_price(5.00, adjustment=PriceAdjustment.ABSOLUTE, value=-10) == 0
+
+
+@pytest.mark.parametrize("scope", ["restaurant_ids", "menu_ids"])
+def test_empty_scope_is_rejected(scope):
+    with pytest.raises(ValidationError):
+        RepriceRequest(**{scope: []}, dry_run=False)
@@ -0,0 +1,78 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.models import AvailabilityWindow
+from app.services.schedule_service import get_zone, is_open_at, next_transition
+
+TZ = get_zone("Asia/Jerusalem")
+
+WEEKDAYS = [0, 1, 2, 3, 4]
+LUNCH = [AvailabilityWindow(days=WEEKDAYS, start="12:00", end="15:00")]
+# Friday night into Saturday
+LATE_NIGHT = [AvailabilityWindow(days=[4], start="22:00", end="02:00")]
+# Equal start and end mean the whole day, from 08:00 to 08:00 the next morning
+ALL_DAY = [AvailabilityWindow(days=[0], start="08:00", end="08:00")]
+
+
+def local(*args) -> datetime:
+    return datetime(*args, tzinfo=TZ)
+
+
+@pytest.mark.parametrize("windows, moment, expected", [
+    (LUNCH, local(2026, 10, 19, 12, 0), True),  # Monday, opening minute
+    (LUNCH, local(2026, 10, 19, 14, 59), True),
+    (LUNCH, local(2026, 10, 19, 15, 0), False),  # the end is exclusive
+    (LUNCH, local(2026, 10, 19, 11, 59), False),
+    (LUNCH, local(2026, 10, 24, 13, 0), False),  # Saturday
+    (LATE_NIGHT, local(2026, 10, 23, 21, 59), False),
+    (LATE_NIGHT, local(2026, 10, 23, 23, 0), True),
+    (LATE_NIGHT, local(2026, 10, 24, 1, 59), True),  # Saturday, window opened on Friday
+    (LATE_NIGHT, local(2026, 10, 24, 2, 0), False),
+    (LATE_NIGHT, local(2026, 10, 24, 23, 0), False),  # Saturday night is not in the window
+    (ALL_DAY, local(2026, 10, 19, 8, 0), True),
+    (ALL_DAY, local(2026, 10, 19, 23, 59), True),
+    (ALL_DAY, local(2026, 10, 20, 7, 59), True),
+    (ALL_DAY, local(2026, 10, 20, 8, 0), False),
+    ([], local(2026, 10, 19, 13, 0), False),
+])
+def test_is_open_at(windows, moment, expected):
+    assert is_open_at(windows, TZ, moment) is expected
+
+
+@pytest.mark.parametrize("windows, after, expected", [
+    (LUNCH, local(2026, 10, 19, 10, 0), local(2026, 10, 19, 12, 0)),
+    (LUNCH, local(2026, 10, 19, 12, 0), local(2026, 10, 19, 15, 0)),  # strictly after
+    (LUNCH, local(2026, 10, 19, 16, 0), local(2026, 10, 20, 12, 0)),
+    (LUNCH, local(2026, 10, 23, 16, 0), local(2026, 10, 26, 12, 0)),  # Friday -> Monday
+    (LATE_NIGHT, local(2026, 10, 23, 23, 0), local(2026, 10, 24, 2, 0)),
+    (ALL_DAY, local(2026, 10, 19, 9, 0), local(2026, 10, 20, 8, 0)),
+])
+def test_next_transition(windows, after, expected):
+    assert next_transition(windows, TZ, after) == expected.astimezone(timezone.utc)
+
+
+def test_next_transition_without_windows():
+    assert next_transition([], TZ, local(2026, 10, 19, 10, 0)) is None
+
+
+def test_transitions_keep_local_time_across_dst():
+    # Israel moves to summer time at 02:00 on Friday 2026-03-27 and back at 02:00 on Sunday 2026-10-25
+    before_spring = next_transition(LUNCH, TZ, local(2026, 3, 26, 16, 0))
+    after_spring = next_transition(LUNCH, TZ, local(2026, 3, 27, 1, 0))
+    assert before_spring == local(2026, 3, 27, 12, 0).astimezone(timezone.utc)
+    assert after_spring.astimezone(TZ).hour == 12
+    assert after_spring.astimezone(timezone.utc).hour == 9  # UTC+3
+
+    after_autumn = next_transition(LUNCH, TZ, local(2026, 10, 25, 16, 0))
+    assert after_autumn.astimezone(TZ).hour == 12
+    assert after_autumn.astimezone(timezone.utc).hour == 10  # UTC+2
+
+
+def test_window_over_the_skipped_hour_is_shorter():
+    # 01:00-04:00 on the spring-forward night lasts two real hours
+    windows = [AvailabilityWindow(days=[4], start="01:00", end="04:00")]
+    start = next_transition(windows, TZ, local(2026, 3, 27, 0, 0))
+    end = next_transition(windows, TZ, start)
+    assert end - start == timedelta(hours=2)
+    assert is_open_at(windows, TZ, start + timedelta(minutes=90))
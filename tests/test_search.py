@@ -0,0 +1,39 @@
+import pytest
+
+from app.search import MAX_SEARCH_TERMS, normalize_search_text, search_terms
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("CAFÉ  Noir!", "cafe noir"),
+    ("Ḥummus", "hummus"),
+    ("שָׁלוֹם", "שלומ"),  # niqqud dropped, final mem mapped to mem
+    ("ךםןףץ", "כמנפצ"),
+    ("צ׳יפס", "ציפס"),  # geresh
+    ("קפה ״לנדוור״", "קפה לנדוור"),  # gershayim
+    ("Tony's Pizza", "tonys pizza"),
+    ("Tony’s Pizza", "tonys pizza"),
+    ("מסעדת הים - תל אביב", "מסעדת הימ תל אביב"),
+    ("   ", ""),
+])
+def test_normalize_search_text(text, expected):
+    assert normalize_search_text(text) == expected
+
+
+def test_typed_prefix_matches_name_with_final_letter():
+    assert search_terms("שלום בית")[0].startswith(normalize_search_text("שלו"))
+    assert search_terms("שלום בית")[0].startswith(normalize_search_text("שלום"))
+
+
+def test_search_terms_start_at_every_word():
+    assert search_terms("Pizza Hut Tel Aviv") == ["pizza hut tel aviv", "hut tel aviv", "tel aviv", "aviv"]
+
+
+def test_search_terms_are_unique():
+    assert search_terms("a a a") == ["a a a", "a a", "a"]
+
+
+def test_search_terms_are_capped():
+    words = [f"w{i}" for i in range(MAX_SEARCH_TERMS + 5)]
+    terms = search_terms(" ".join(words))
+    assert len(terms) == MAX_SEARCH_TERMS
+    assert terms[-1] == " ".join(words[MAX_SEARCH_TERMS - 1:])